@@ -1,2 +1,3 @@
 # app/backend/agents/__init__.py
-from . import router  # re-export for main.py usage
+# Submodules are imported on demand (e.g. `from app.backend.agents import router`);
+# importing them here would load the fallback router on every app start.
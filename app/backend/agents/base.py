@@ -1,5 +1,6 @@
 # app/backend/agents/base.py
 from typing import Protocol, Dict, Any, List
+import numpy as np
 from pydantic import BaseModel
 
 class AgentResult(BaseModel):
@@ -19,10 +20,14 @@ def register(agent: Agent):
     REGISTRY[agent.name] = agent
     return agent
 
+_SCORE_MAP = {"BUY": 1.0, "HOLD": 0.0, "SELL": -1.0}
+
 def ensemble(results: List[AgentResult]) -> Dict[str, Any]:
     if not results:
         return {"decision": "HOLD", "score": 0.0, "confidence": 0.0}
-    score_map = {"BUY": 1.0, "HOLD": 0.0, "SELL": -1.0}
-    avg = sum(score_map[r.decision] * max(0.2, min(1.0, r.confidence)) for r in results) / len(results)
+    n = len(results)
+    scores = np.fromiter((_SCORE_MAP[r.decision] for r in results), dtype=np.float64, count=n)
+    confs = np.clip(np.fromiter((r.confidence for r in results), dtype=np.float64, count=n), 0.2, 1.0)
+    avg = float(scores @ confs) / n
     decision = "BUY" if avg > 0.2 else "SELL" if avg < -0.2 else "HOLD"
     return {"decision": decision, "score": avg, "confidence": min(1.0, abs(avg))}
@@ -0,0 +1,23 @@
+# app/backend/agents/cache.py
+import hashlib, json, os
+from typing import Any, Dict, List
+
+from app.backend.cache import TTLCache
+
+# Only near-deterministic completions are worth replaying from cache
+MAX_CACHEABLE_TEMPERATURE = 0.3
+
+class LLMCache(TTLCache):
+    """Exact-match prompt -> completion cache (in-process, LRU with a TTL)."""
+
+    @staticmethod
+    def key(model: str, messages: List[Dict[str, Any]], temperature: float, **extra: Any) -> str:
+        """`extra` holds any other request options that change the completion (e.g. response_format)."""
+        raw = json.dumps({"model": model, "messages": messages, "temperature": temperature, **extra}, sort_keys=True)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+# Shared by llm_client.chat and llm.call_openai
+llm_cache = LLMCache(
+    maxsize=int(os.getenv("LLM_CACHE_MAXSIZE", "10000")),
+    ttl=float(os.getenv("LLM_CACHE_TTL", "3600")),
+)
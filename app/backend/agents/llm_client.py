@@ -1,29 +1,41 @@
 # app/backend/agents/llm_client.py
-import re, hashlib
-import os
+import re, hashlib, json
+import logging
 import httpx
-from typing import Optional, Dict, Any
-
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai")
-LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
-
-# Dev flags
-MOCK = os.getenv("LLM_MOCK", "0") == "1"
-FALLBACK_ON_QUOTA = os.getenv("LLM_FALLBACK_TO_MOCK_ON_QUOTA", "1") == "1"
-
-print(f"llm_client: loaded (robust extractor) mock={MOCK} fallback={FALLBACK_ON_QUOTA} model={LLM_MODEL}")
-
-def _openai_base_url() -> str:
-    return os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
-
-def _headers() -> Dict[str, str]:
-    if LLM_PROVIDER == "openai":
-        return {
-            "Authorization": f"Bearer {OPENAI_API_KEY}",
-            "Content-Type": "application/json",
-        }
-    return {"Content-Type": "application/json"}
+from functools import lru_cache
+from typing import Optional, Dict, Any, List, Pattern, Tuple
+
+from app.backend.agents.cache import llm_cache, MAX_CACHEABLE_TEMPERATURE
+from app.backend import http_client, llm_config
+from app.backend.http_client import post_with_retry
+from app.backend.llm_config import reload_config
+
+# Mock-mode prompt parsing (compiled once; _mock_reply runs on every mocked call)
+_PERSONA_RE = re.compile(r"You are the\s+(.+?)\s+agent", re.I)
+_TICKER_RE = re.compile(r"Analyze\s+([A-Z][A-Z0-9.\-]*)")
+
+__all__ = ["chat", "submit_batch", "batch_results", "reload_config"]
+
+logging.debug(f"llm_client: loaded (robust extractor) mock={llm_config.MOCK} fallback={llm_config.FALLBACK_ON_QUOTA} model={llm_config.LLM_MODEL}")
+
+async def _read_stream(resp: httpx.Response, stop_at: Optional[Pattern[str]] = None) -> str:
+    """Accumulates the SSE content deltas; closes early once `stop_at` matches the text so far."""
+    text = ""
+    async for line in resp.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            break
+        choices = json.loads(data).get("choices") or []
+        delta = (choices[0].get("delta") or {}).get("content") if choices else None
+        if not delta:
+            continue
+        text += delta
+        # Only the tail can contain a new match
+        if stop_at is not None and stop_at.search(text, max(0, len(text) - len(delta) - 64)):
+            break
+    return text.strip()
 
 def _extract_text(data: Dict[str, Any]) -> str:
     if "choices" in data and data["choices"]:
@@ -40,30 +52,34 @@ def _extract_text(data: Dict[str, Any]) -> str:
         raise RuntimeError(f"LLM error: {err.get('message') or err}")
     raise RuntimeError(f"Unexpected LLM response shape: {list(data.keys())}")
 
+@lru_cache(maxsize=4096)
+def _mock_action(persona: str, ticker: str) -> str:
+    # Deterministic mix by persona+ticker so results are stable per request
+    seed = hashlib.md5(f"{persona}:{ticker}".encode()).digest()[0] % 3
+    return ["buy", "hold", "sell"][seed]
+
 def _mock_reply(prompt: str) -> str:
     if "exactly: PONG" in prompt:
         return "PONG"
 
     # Optional override via env: LLM_MOCK_MODE=buy|sell|hold|mix
-    mode = os.getenv("LLM_MOCK_MODE", "mix").lower()
+    mode = llm_config.MOCK_MODE
 
     # Extract persona and ticker from the prompt (best effort)
     persona = "Agent"
-    m = re.search(r"You are the\s+(.+?)\s+agent", prompt, re.I)
+    m = _PERSONA_RE.search(prompt)
     if m:
         persona = m.group(1).strip()
 
     ticker = "TICKER"
-    m = re.search(r"Analyze\s+([A-Z][A-Z0-9.\-]*)", prompt)
+    m = _TICKER_RE.search(prompt)
     if m:
         ticker = m.group(1).upper()
 
     if mode in ("buy", "sell", "hold"):
         action = mode
     else:
-        # Deterministic mix by persona+ticker so results are stable per request
-        seed = hashlib.md5(f"{persona}:{ticker}".encode()).digest()[0] % 3
-        action = ["buy", "hold", "sell"][seed]
+        action = _mock_action(persona, ticker)
 
     conf = {"buy": 0.72, "hold": 0.55, "sell": 0.68}[action]
 
@@ -74,18 +90,10 @@ def _mock_reply(prompt: str) -> str:
     )
 
 
-async def chat(prompt: str, model: Optional[str] = None, temperature: float = 0.2, timeout_s: float = 30.0) -> str:
-    if MOCK:
-        return _mock_reply(prompt)
-
-    if LLM_PROVIDER != "openai":
-        raise NotImplementedError(f"Provider {LLM_PROVIDER} not wired yet")
-    if not OPENAI_API_KEY:
-        raise RuntimeError("OPENAI_API_KEY not set")
-
-    url = f"{_openai_base_url()}/chat/completions"
-    payload = {
-        "model": model or LLM_MODEL,
+def _chat_payload(prompt: str, model: Optional[str], temperature: float) -> Dict[str, Any]:
+    """Chat-completions body shared by chat() and the Batch API requests."""
+    return {
+        "model": model or llm_config.LLM_MODEL,
         "messages": [
             {"role": "system", "content": "You are an investing co-pilot. Be concise and practical."},
             {"role": "user", "content": prompt},
@@ -93,8 +101,34 @@ async def chat(prompt: str, model: Optional[str] = None, temperature: float = 0.
         "temperature": temperature,
     }
 
-    async with httpx.AsyncClient(timeout=timeout_s) as client:
-        resp = await client.post(url, headers=_headers(), json=payload)
+async def chat(prompt: str, model: Optional[str] = None, temperature: float = 0.2, timeout_s: float = 30.0,
+               stop_at: Optional[Pattern[str]] = None) -> str:
+    """
+    Streams the completion so tokens flow as soon as they are generated. Pass `stop_at`
+    to hang up once the reply contains everything the caller parses (e.g. its last field).
+    """
+    if llm_config.MOCK:
+        return _mock_reply(prompt)
+
+    if llm_config.LLM_PROVIDER != "openai":
+        raise NotImplementedError(f"Provider {llm_config.LLM_PROVIDER} not wired yet")
+    if not llm_config.OPENAI_API_KEY:
+        raise RuntimeError("OPENAI_API_KEY not set")
+
+    payload = _chat_payload(prompt, model, temperature)
+
+    cache_key = None
+    if temperature <= MAX_CACHEABLE_TEMPERATURE:
+        # A stop_at reply is truncated, so it must not answer callers that want the full text
+        stop = {"stop_at": [stop_at.pattern, stop_at.flags]} if stop_at is not None else {}
+        cache_key = llm_cache.key(payload["model"], payload["messages"], temperature, **stop)
+        hit = llm_cache.get(cache_key)
+        if hit is not None:
+            return hit
+
+    resp = await post_with_retry(http_client.LLM_CLIENT, f"{llm_config.OPENAI_BASE_URL}/chat/completions", headers=llm_config.OPENAI_HEADERS, json={**payload, "stream": True},
+                                 timeout=timeout_s, stream=True)
+    try:
         if resp.status_code // 100 != 2:
             # Try to parse JSON; fall back to mock if quota
             try:
@@ -105,10 +139,94 @@ async def chat(prompt: str, model: Optional[str] = None, temperature: float = 0.
             if resp.status_code == 429:
                 err = (body.get("error") if isinstance(body, dict) else {}) or {}
                 code = str(err.get("code") or err.get("type") or "").lower()
-                if FALLBACK_ON_QUOTA and code in ("insufficient_quota", "billing_hard_limit_reached"):
+                if llm_config.FALLBACK_ON_QUOTA and code in ("insufficient_quota", "billing_hard_limit_reached"):
                     return _mock_reply(prompt)
 
             raise RuntimeError(f"LLM HTTP {resp.status_code}: {body}")
 
-        data = resp.json()
-        return _extract_text(data)
+        if "text/event-stream" in resp.headers.get("content-type", ""):
+            text = await _read_stream(resp, stop_at)
+        else:
+            # OpenAI-compatible servers that ignore "stream" answer with plain JSON
+            await resp.aread()
+            text = _extract_text(resp.json())
+    finally:
+        await resp.aclose()
+
+    if cache_key is not None:
+        llm_cache.set(cache_key, text)
+    return text
+
+# ----------------------- Batch API -----------------------
+def _require_openai() -> None:
+    if llm_config.MOCK or llm_config.LLM_PROVIDER != "openai" or not llm_config.OPENAI_API_KEY:
+        raise RuntimeError("Batch mode needs LLM_PROVIDER=openai, OPENAI_API_KEY and LLM_MOCK off")
+
+async def submit_batch(prompts: Dict[str, str], model: Optional[str] = None, temperature: float = 0.2) -> Dict[str, Any]:
+    """
+    Queues the prompts (custom_id -> prompt) as one OpenAI Batch job: half the token
+    price, results within 24h. Returns the batch object; poll it with batch_results().
+    Raises RuntimeError when not configured for OpenAI, httpx.HTTPError on API errors.
+    """
+    _require_openai()
+    jsonl = "\n".join(
+        json.dumps({
+            "custom_id": cid,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": _chat_payload(prompt, model, temperature),
+        })
+        for cid, prompt in prompts.items()
+    )
+    # Multipart upload: only the auth header, httpx sets the content type
+    up = await http_client.LLM_CLIENT.post(
+        f"{llm_config.OPENAI_BASE_URL}/files",
+        headers={"Authorization": llm_config.OPENAI_HEADERS["Authorization"]},
+        data={"purpose": "batch"},
+        files={"file": ("batch.jsonl", jsonl.encode(), "application/jsonl")},
+    )
+    up.raise_for_status()
+    r = await http_client.LLM_CLIENT.post(
+        f"{llm_config.OPENAI_BASE_URL}/batches",
+        headers=llm_config.OPENAI_HEADERS,
+        json={
+            "input_file_id": up.json()["id"],
+            "endpoint": "/v1/chat/completions",
+            "completion_window": "24h",
+            "metadata": {"model": model or llm_config.LLM_MODEL},
+        },
+    )
+    r.raise_for_status()
+    return r.json()
+
+async def _batch_file_lines(file_id: Optional[str]) -> List[Dict[str, Any]]:
+    if not file_id:
+        return []
+    r = await http_client.LLM_CLIENT.get(f"{llm_config.OPENAI_BASE_URL}/files/{file_id}/content", headers=llm_config.OPENAI_HEADERS)
+    r.raise_for_status()
+    return [json.loads(raw) for raw in r.text.splitlines() if raw.strip()]
+
+async def batch_results(batch_id: str) -> Tuple[Dict[str, Any], Optional[Dict[str, Optional[str]]]]:
+    """
+    (batch, replies). replies is None until the batch has completed, then maps every
+    custom_id to its reply text, or to None when that request failed.
+    """
+    _require_openai()
+    r = await http_client.LLM_CLIENT.get(f"{llm_config.OPENAI_BASE_URL}/batches/{batch_id}", headers=llm_config.OPENAI_HEADERS)
+    r.raise_for_status()
+    batch = r.json()
+    if batch.get("status") != "completed":
+        return batch, None
+
+    replies: Dict[str, Optional[str]] = {}
+    for item in await _batch_file_lines(batch.get("output_file_id")) + await _batch_file_lines(batch.get("error_file_id")):
+        cid = item.get("custom_id")
+        if not cid:
+            logging.warning(f"batch {batch_id}: skipping output line without custom_id: {str(item)[:200]}")
+            continue
+        resp = item.get("response") or {}
+        try:
+            replies[cid] = _extract_text(resp["body"]) if resp.get("status_code") == 200 else None
+        except Exception:
+            replies[cid] = None
+    return batch, replies
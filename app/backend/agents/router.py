@@ -3,13 +3,19 @@
 from fastapi import APIRouter
 from pydantic import BaseModel, Field
 from typing import List, Dict, Optional, Any
-import os, hashlib
+import hashlib, asyncio, json
+from functools import lru_cache
+
+from app.backend import http_client, llm_config
+from app.backend.http_client import post_with_retry
 
 try:
     import httpx  # optional; if missing we use rule-based mode
 except Exception:
     httpx = None
 
+OPENAI_API = "https://api.openai.com/v1"
+
 router = APIRouter(prefix="/agents", tags=["agents"])
 
 # ---------- Models ----------
@@ -38,10 +44,11 @@ class SignalOut(BaseModel):
     results: List[TickerDecision]
 
 # ---------- Helpers ----------
+@lru_cache(maxsize=4096)  # the same (agent,ticker) pairs recur across requests
 def _stable_score(key: str) -> float:
     """Deterministic 0..1 score per (agent,ticker) so results are stable across runs."""
-    h = hashlib.sha256(key.encode()).hexdigest()
-    return (int(h[:8], 16) % 1000) / 1000.0
+    # 4 raw digest bytes are all we use; skips the hex encode -> int parse round-trip
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=4).digest(), "big") % 1000 / 1000.0
 
 def _rule_based_decision(agent: str, ticker: str) -> AgentDecision:
     s = _stable_score(f"{agent}:{ticker}")
@@ -53,70 +60,87 @@ def _rule_based_decision(agent: str, ticker: str) -> AgentDecision:
         action = "hold"
     conf = round(abs(s - 0.5) * 2, 2)  # 0..1
     why = f"Placeholder {agent} heuristic; score={s:.2f}. Replace with real logic/LLM anytime."
-    return AgentDecision(agent=agent, action=action, confidence=conf, rationale=why)
+    return AgentDecision.model_construct(agent=agent, action=action, confidence=conf, rationale=why)
+
+def _chat_body(agent: str, ticker: str, context: Optional[Dict[str, Any]], model: str) -> Dict[str, Any]:
+    """Chat-completions request body for one (agent, ticker) decision."""
+    # Static instructions first, per-ticker data last: keeps a shared prefix for provider prompt caching
+    prompt = (
+        f"You are an investing persona named {agent}. "
+        "Decide BUY/HOLD/SELL for the ticker below over the next 1-3 months, "
+        "using the optional context if given. "
+        "Return JSON with keys: action (buy|hold|sell), confidence (0..1), reason.\n"
+        f"---\nTicker: {ticker}\nContext: {context or {}}"
+    )
+    return {
+        "model": model,
+        "messages": [{"role": "user", "content": prompt}],
+        "response_format": {"type": "json_object"},
+        "prompt_cache_key": f"persona:{agent}",
+    }
+
+def _decision_from_content(agent: str, content: str) -> AgentDecision:
+    j = json.loads(content)
+    action = str(j.get("action", "hold")).lower()
+    confidence = float(j.get("confidence", 0.5))
+    reason = str(j.get("reason", "LLM rationale."))
+    confidence = max(0.0, min(confidence, 1.0))
+    if action not in {"buy","hold","sell"}:
+        action = "hold"
+    return AgentDecision.model_construct(agent=agent, action=action, confidence=confidence, rationale=reason)
 
 async def _llm_decision(agent: str, ticker: str, context: Optional[Dict[str, Any]]) -> AgentDecision:
     """Calls OpenAI if OPENAI_API_KEY is set and httpx is installed, else falls back."""
-    api_key = os.getenv("OPENAI_API_KEY")
-    model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-    if not api_key or httpx is None:
+    if not llm_config.OPENAI_API_KEY or httpx is None:
         return _rule_based_decision(agent, ticker)
 
-    prompt = (
-        f"You are an investing persona named {agent}. "
-        f"Decide BUY/HOLD/SELL for {ticker} over the next 1-3 months. "
-        f"Use this optional context: {context or {}}. "
-        "Return JSON with keys: action (buy|hold|sell), confidence (0..1), reason."
-    )
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            r = await client.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers={"Authorization": f"Bearer {api_key}"},
-                json={
-                    "model": model,
-                    "messages": [{"role": "user", "content": prompt}],
-                    "response_format": {"type": "json_object"},
-                },
-            )
+        r = await post_with_retry(
+            http_client.LLM_CLIENT,
+            f"{OPENAI_API}/chat/completions",
+            headers=llm_config.OPENAI_HEADERS,
+            json=_chat_body(agent, ticker, context, llm_config.OPENAI_MODEL or "gpt-4o-mini"),
+        )
         data = r.json()
-        content = data["choices"][0]["message"]["content"]
-
-        import json
-        j = json.loads(content)
-        action = str(j.get("action", "hold")).lower()
-        confidence = float(j.get("confidence", 0.5))
-        reason = j.get("reason", "LLM rationale.")
-        confidence = max(0.0, min(confidence, 1.0))
-        if action not in {"buy","hold","sell"}:
-            action = "hold"
-        return AgentDecision(agent=agent, action=action, confidence=confidence, rationale=reason)
+        return _decision_from_content(agent, data["choices"][0]["message"]["content"])
     except Exception as e:
-        return AgentDecision(agent=agent, action="hold", confidence=0.0, rationale=f"LLM call failed: {e}")
+        return AgentDecision.model_construct(agent=agent, action="hold", confidence=0.0, rationale=f"LLM call failed: {e}")
+
+def _ticker_decision(ticker: str, decisions: List[AgentDecision]) -> TickerDecision:
+    # Weighted vote: buy=+1, sell=-1, hold=0 (weighted by confidence)
+    score = sum((1 if d.action=="buy" else -1 if d.action=="sell" else 0) * d.confidence for d in decisions)
+    final = "buy" if score > 0.15 else "sell" if score < -0.15 else "hold"
+    return TickerDecision.model_construct(ticker=ticker, decisions=decisions, final_vote=final, final_score=round(score, 3))
 
 # ---------- Endpoints ----------
 @router.get("/ping")
-def ping():
+async def ping():
     return {"ok": True, "agents": ["buffett", "munger", "technicals"]}
 
 @router.post("/signal", response_model=SignalOut)
 async def signal(body: SignalIn):
-    use_llm = bool(os.getenv("OPENAI_API_KEY")) and (httpx is not None)
+    use_llm = bool(llm_config.OPENAI_API_KEY) and (httpx is not None)
     mode = "llm" if use_llm else "rule-based"
-    results: List[TickerDecision] = []
 
-    for t in body.tickers:
-        decisions: List[AgentDecision] = []
-        for a in body.agents:
-            if use_llm:
-                dec = await _llm_decision(a, t, body.context)
-            else:
-                dec = _rule_based_decision(a, t)
-            decisions.append(dec)
-
-        # Weighted vote: buy=+1, sell=-1, hold=0 (weighted by confidence)
-        score = sum((1 if d.action=="buy" else -1 if d.action=="sell" else 0) * d.confidence for d in decisions)
-        final = "buy" if score > 0.15 else "sell" if score < -0.15 else "hold"
-        results.append(TickerDecision(ticker=t, decisions=decisions, final_vote=final, final_score=round(score, 3)))
-
-    return SignalOut(mode=mode, llm_model=os.getenv("OPENAI_MODEL") if mode=="llm" else None, results=results)
+    # Fan out every (ticker, agent) pair at once; results come back in input order
+    if use_llm:
+        flat = await asyncio.gather(
+            *(_llm_decision(a, t, body.context) for t in body.tickers for a in body.agents),
+            return_exceptions=True,
+        )
+    else:
+        flat = [_rule_based_decision(a, t) for t in body.tickers for a in body.agents]
+
+    n = len(body.agents)
+    results: List[TickerDecision] = []
+    for i, t in enumerate(body.tickers):
+        decisions: List[AgentDecision] = [
+            d if isinstance(d, AgentDecision)
+            else AgentDecision.model_construct(agent=a, action="hold", confidence=0.0, rationale=f"LLM call failed: {d}")
+            for a, d in zip(body.agents, flat[i * n:(i + 1) * n])
+        ]
+        results.append(_ticker_decision(t, decisions))
+
+    # Results are built from values we already normalized, so they use model_construct
+    # (no per-object validation); the response_model still documents and serializes them.
+    return SignalOut.model_construct(mode=mode, llm_model=llm_config.OPENAI_MODEL if mode=="llm" else None, results=results)
@@ -0,0 +1,55 @@
+# app/backend/cache.py
+import asyncio, time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+class TTLCache:
+    """Small in-process LRU cache whose entries expire `ttl` seconds after being set."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, "asyncio.Future[Any]"] = {}
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires, value = item
+        if expires < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]], ttl: Optional[float] = None) -> Any:
+        """
+        Cached value for `key`, else the result of `loader()` (stored on success).
+        Concurrent misses on one key share a single load instead of each calling upstream.
+        """
+        hit = self.get(key)
+        if hit is not None:
+            return hit
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(loader())
+            self._inflight[key] = task
+
+            def _done(t: "asyncio.Future[Any]") -> None:
+                self._inflight.pop(key, None)
+                if not t.cancelled() and t.exception() is None:
+                    self.set(key, t.result(), ttl)
+
+            task.add_done_callback(_done)
+        # shield: one waiter being cancelled must not cancel the load the others share
+        return await asyncio.shield(task)
+
+    def clear(self) -> None:
+        self._data.clear()
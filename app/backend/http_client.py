@@ -0,0 +1,171 @@
+# app/backend/http_client.py
+import asyncio, os, random
+import importlib.util
+from typing import Any
+import httpx
+
+try:
+    import orjson  # optional; faster parse of large JSON bodies
+except Exception:
+    orjson = None
+
+# HTTP/2 needs the optional h2 package (the httpx[http2] extra); without it the clients
+# stay on HTTP/1.1 instead of failing at import
+_HTTP2 = importlib.util.find_spec("h2") is not None
+
+# One pooled client for every OpenAI call (llm_client, llm, agents.router): the /signal
+# fan-out reuses warm TCP/TLS and HTTP/2 connections instead of handshaking per call
+def _llm_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(30.0),
+        limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+        http2=_HTTP2,
+    )
+
+# One pooled client for market data (Yahoo chart API, Stooq CSV) shared by the market and
+# backtest routers, so repeat price fetches reuse warm TLS sessions
+def _data_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(20.0),
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        http2=_HTTP2,
+        headers={"User-Agent": "Mozilla/5.0"},
+    )
+
+_FACTORIES = {"LLM_CLIENT": _llm_client, "DATA_CLIENT": _data_client}
+_CLIENTS: dict = {}
+
+def __getattr__(name: str) -> httpx.AsyncClient:
+    """
+    http_client.LLM_CLIENT / DATA_CLIENT, built on first access: importing this module (e.g.
+    via the market router at startup) opens no client. Callers look them up at call time,
+    since aclose_clients() drops them.
+    """
+    factory = _FACTORIES.get(name)
+    if factory is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    client = _CLIENTS.get(name)
+    if client is None:
+        client = _CLIENTS[name] = factory()
+    return client
+
+async def aclose_clients() -> None:
+    """
+    Close the pooled clients that were opened (app shutdown). The next access builds fresh
+    ones, so a later lifespan in the same process (e.g. repeated TestClient contexts) still works.
+    """
+    old = list(_CLIENTS.values())
+    _CLIENTS.clear()
+    for client in old:
+        await client.aclose()
+
+def read_json(resp: httpx.Response) -> Any:
+    """Parse a JSON body straight from the raw bytes (orjson when installed)."""
+    return orjson.loads(resp.content) if orjson is not None else resp.json()
+
+def body_snippet(resp: httpx.Response, n: int = 300) -> str:
+    """First n bytes of the body for error messages, without decoding all of it."""
+    return resp.content[:n].decode("utf-8", "replace")
+
+async def stream_snippet(resp: httpx.Response, n: int = 300) -> str:
+    """body_snippet for an unread streamed response: pulls only the first n bytes off the wire."""
+    buf = b""
+    async for chunk in resp.aiter_bytes():
+        buf += chunk
+        if len(buf) >= n:
+            break
+    return buf[:n].decode("utf-8", "replace")
+
+# Caps in-flight OpenAI calls across every caller so fan-outs stay under RPM limits
+LLM_SEMAPHORE = asyncio.Semaphore(int(os.getenv("LLM_MAX_CONCURRENCY", "8")))
+
+# 429s that will not clear by waiting
+_NO_RETRY_CODES = {"insufficient_quota", "billing_hard_limit_reached"}
+
+def _retryable(resp: httpx.Response) -> bool:
+    if resp.status_code >= 500:
+        return True
+    if resp.status_code != 429:
+        return False
+    try:
+        err = resp.json().get("error") or {}
+        code = str(err.get("code") or err.get("type") or "").lower()
+    except Exception:
+        return True
+    return code not in _NO_RETRY_CODES
+
+def _retry_delay(resp: httpx.Response | None, attempt: int) -> float:
+    retry_after = resp.headers.get("retry-after") if resp is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), 60.0)
+        except ValueError:
+            pass
+    # Exponential backoff with jitter: ~1s, 2s, 4s, ... capped at 30s
+    return min(30.0, 2.0 ** attempt) * random.uniform(0.5, 1.0)
+
+class _PermitStream(httpx.AsyncByteStream):
+    """Response body that returns its LLM_SEMAPHORE slot when the response is closed."""
+
+    def __init__(self, stream: httpx.AsyncByteStream) -> None:
+        self._stream = stream
+        self._held = True
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if self._held:
+                self._held = False
+                LLM_SEMAPHORE.release()
+
+async def _send_streaming(client: httpx.AsyncClient, url: str, **kwargs) -> httpx.Response:
+    # The slot is held until the body is read or closed, not just until the headers arrive
+    await LLM_SEMAPHORE.acquire()
+    try:
+        resp = await client.send(client.build_request("POST", url, **kwargs), stream=True)
+    except BaseException:
+        LLM_SEMAPHORE.release()
+        raise
+    resp.stream = _PermitStream(resp.stream)
+    if resp.is_closed:  # body was already in memory, nothing left to read
+        await resp.stream.aclose()
+    elif resp.is_error:
+        try:
+            await resp.aread()
+        except BaseException:
+            await resp.aclose()
+            raise
+    return resp
+
+async def post_with_retry(client: httpx.AsyncClient, url: str, *, max_attempts: int = 5, stream: bool = False, **kwargs) -> httpx.Response:
+    """
+    POST under LLM_SEMAPHORE, retrying transport errors, 5xx and transient 429s with
+    exponential backoff (Retry-After wins when present). Returns the last response,
+    so callers keep their own status handling.
+
+    With stream=True a 2xx body is left unread for the caller to iterate, and the
+    semaphore slot stays taken until the caller aclose()s the response; error bodies
+    are always read (which frees the slot) so resp.json() works.
+    """
+    for attempt in range(max_attempts):
+        last = attempt == max_attempts - 1
+        try:
+            if stream:
+                resp = await _send_streaming(client, url, **kwargs)
+            else:
+                async with LLM_SEMAPHORE:
+                    resp = await client.post(url, **kwargs)
+        except httpx.TransportError:
+            if last:
+                raise
+            await asyncio.sleep(_retry_delay(None, attempt))
+            continue
+        if last or not _retryable(resp):
+            return resp
+        await resp.aclose()
+        await asyncio.sleep(_retry_delay(resp, attempt))
@@ -1,15 +1,17 @@
 # app/backend/llm.py
-import os
-import httpx
-from typing import Optional
+from typing import Optional, Dict, Any
+
+from app.backend.agents.cache import llm_cache, MAX_CACHEABLE_TEMPERATURE
+from app.backend import http_client, llm_config
+from app.backend.http_client import post_with_retry
 
 def have_llm() -> bool:
-    return os.environ.get("LLM_PROVIDER","").lower() in {"openai"} and bool(os.environ.get("OPENAI_API_KEY"))
+    return llm_config.LLM_PROVIDER_ENV.lower() == "openai" and bool(llm_config.OPENAI_API_KEY)
 
-async def call_openai(prompt: str, model: Optional[str]=None, system: Optional[str]=None, temperature: float=0.3) -> str:
-    api_key = os.environ["OPENAI_API_KEY"]
-    model = model or os.environ.get("OPENAI_MODEL","gpt-4o-mini")
-    headers = {"Authorization": f"Bearer {api_key}", "Content-Type":"application/json"}
+async def call_openai(prompt: str, model: Optional[str]=None, system: Optional[str]=None, temperature: float=0.3, prompt_cache_key: Optional[str]=None, response_format: Optional[Dict[str, Any]]=None) -> str:
+    if not llm_config.OPENAI_API_KEY:
+        raise KeyError("OPENAI_API_KEY")
+    model = model or llm_config.OPENAI_MODEL or "gpt-4o-mini"
     payload = {
         "model": model,
         "messages": [
@@ -18,8 +20,21 @@ async def call_openai(prompt: str, model: Optional[str]=None, system: Optional[s
         ],
         "temperature": temperature,
     }
-    async with httpx.AsyncClient(timeout=60) as client:
-        r = await client.post("https://api.openai.com/v1/chat/completions", headers=headers, json=payload)
-        r.raise_for_status()
-        data = r.json()
-        return data["choices"][0]["message"]["content"].strip()
+    if response_format:
+        payload["response_format"] = response_format
+    if prompt_cache_key:
+        # Routes calls sharing a static prefix to the same provider-side prompt cache
+        payload["prompt_cache_key"] = prompt_cache_key
+    cache_key = None
+    if temperature <= MAX_CACHEABLE_TEMPERATURE:
+        cache_key = llm_cache.key(model, payload["messages"], temperature, response_format=response_format)
+        hit = llm_cache.get(cache_key)
+        if hit is not None:
+            return hit
+    r = await post_with_retry(http_client.LLM_CLIENT, "https://api.openai.com/v1/chat/completions", headers=llm_config.OPENAI_HEADERS, json=payload, timeout=60)
+    r.raise_for_status()
+    data = r.json()
+    text = (data["choices"][0]["message"].get("content") or "").strip()  # None on a structured-output refusal
+    if cache_key is not None and text:
+        llm_cache.set(cache_key, text)
+    return text
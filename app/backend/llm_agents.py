@@ -1,21 +1,50 @@
 # app/backend/agents/llm_agents.py
-from .base import AgentResult, register
-from ..llm import have_llm, call_openai
+from app.backend.agents.base import AgentResult, register
+from app.backend.llm import have_llm, call_openai
 from typing import Dict, Any
-import re
+import json
 
-def _extract_vote(text: str) -> str:
-    t = text.upper()
-    if "SELL" in t and "BUY" not in t: return "SELL"
-    if "BUY" in t and "SELL" not in t: return "BUY"
-    return "HOLD"
+# Structured output: the model must return exactly these keys, so no free-text parsing
+_DECISION_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "decision",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "rationale": {"type": "string"},
+                "decision": {"type": "string", "enum": ["BUY", "HOLD", "SELL"]},
+                "confidence": {"type": "number"},
+            },
+            "required": ["rationale", "decision", "confidence"],
+            "additionalProperties": False,
+        },
+    },
+}
 
-def _extract_conf(text: str) -> float:
-    m = re.search(r"confidence\s*[:=]\s*(\d{1,3})\s*%", text, re.I)
-    if m:
-        v = int(m.group(1))
-        return max(0, min(100, v))/100.0
-    return 0.5
+def _parse_decision(agent: str, out: str) -> AgentResult:
+    try:
+        j = json.loads(out)
+        conf = max(0.0, min(1.0, float(j["confidence"])))
+        return AgentResult(agent=agent, decision=j["decision"], confidence=conf, rationale=str(j["rationale"])[:480])
+    except Exception:
+        return AgentResult(agent=agent, decision="HOLD", confidence=0.3, rationale=f"Unparseable LLM reply: {out[:400]}")
+
+# Static persona rubrics go first so repeat calls share a cacheable prompt prefix;
+# the per-stock block is appended last.
+_BUFFETT_RUBRIC = """
+Act like Warren Buffett. Focus on durable competitive advantage, ROIC, debt, earnings stability, management quality, and fair price.
+Reply in JSON: "rationale" as 3 short bullets, "decision" as BUY/HOLD/SELL, "confidence" between 0 and 1.
+"""
+
+_MUNGER_RUBRIC = """
+Act like Charlie Munger. Emphasize mental models, inversion, incentives, and avoiding stupidity.
+Reply in JSON: "rationale" as 3 crisp points, "decision" as BUY/HOLD/SELL, "confidence" between 0 and 1.
+"""
+
+def _stock_block(symbol: str, context: Dict[str, Any]) -> str:
+    return f"---\nStock: {symbol}\nContext: {context.get('summary','n/a')}\n"
 
 class BuffettAgent:
     name = "buffett"
@@ -23,17 +52,9 @@ class BuffettAgent:
     async def run(self, symbol: str, context: Dict[str, Any]) -> AgentResult:
         if not have_llm():
             return AgentResult(agent=self.name, decision="HOLD", confidence=0.3, rationale="LLM not configured; defaulting to HOLD.")
-        prompt = f"""
-Stock: {symbol}
-Context: {context.get('summary','n/a')}
-
-Act like Warren Buffett. Focus on durable competitive advantage, ROIC, debt, earnings stability, management quality, and fair price.
-Respond with 3 short bullets. End with:
-Decision: BUY/HOLD/SELL
-Confidence: NN%
-"""
-        out = await call_openai(prompt, temperature=0.2, system="You are Warren Buffett-ish but concise and practical.")
-        return AgentResult(agent=self.name, decision=_extract_vote(out), confidence=_extract_conf(out), rationale=out[:480])
+        prompt = _BUFFETT_RUBRIC + _stock_block(symbol, context)
+        out = await call_openai(prompt, temperature=0.2, system="You are Warren Buffett-ish but concise and practical.", prompt_cache_key="buffett", response_format=_DECISION_FORMAT)
+        return _parse_decision(self.name, out)
 
 register(BuffettAgent())
 
@@ -43,16 +64,8 @@ class MungerAgent:
     async def run(self, symbol: str, context: Dict[str, Any]) -> AgentResult:
         if not have_llm():
             return AgentResult(agent=self.name, decision="HOLD", confidence=0.3, rationale="LLM not configured; defaulting to HOLD.")
-        prompt = f"""
-Stock: {symbol}
-Context: {context.get('summary','n/a')}
-
-Act like Charlie Munger. Emphasize mental models, inversion, incentives, and avoiding stupidity.
-Respond with 3 crisp points. End with:
-Decision: BUY/HOLD/SELL
-Confidence: NN%
-"""
-        out = await call_openai(prompt, temperature=0.3, system="You are Charlie Munger-ish: blunt, analytical, concise.")
-        return AgentResult(agent=self.name, decision=_extract_vote(out), confidence=_extract_conf(out), rationale=out[:480])
+        prompt = _MUNGER_RUBRIC + _stock_block(symbol, context)
+        out = await call_openai(prompt, temperature=0.3, system="You are Charlie Munger-ish: blunt, analytical, concise.", prompt_cache_key="munger", response_format=_DECISION_FORMAT)
+        return _parse_decision(self.name, out)
 
 register(MungerAgent())
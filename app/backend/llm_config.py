@@ -0,0 +1,27 @@
+# app/backend/llm_config.py
+import os
+
+# LLM env config shared by llm_client, llm and agents.router. It is read once here (and on
+# reload_config()) so the call paths never touch os.environ; callers read it as
+# llm_config.NAME at call time so a reload is picked up.
+def reload_config() -> None:
+    """Re-read the LLM env vars; call after changing them at runtime (e.g. after load_dotenv)."""
+    global OPENAI_API_KEY, OPENAI_BASE_URL, OPENAI_MODEL, OPENAI_HEADERS
+    global LLM_PROVIDER_ENV, LLM_PROVIDER, LLM_MODEL, MOCK, MOCK_MODE, FALLBACK_ON_QUOTA
+    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+    OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+    OPENAI_MODEL = os.getenv("OPENAI_MODEL")  # None when unset; agents.router reports it as-is
+    OPENAI_HEADERS = {
+        "Authorization": f"Bearer {OPENAI_API_KEY}",
+        "Content-Type": "application/json",
+    }
+    LLM_PROVIDER_ENV = os.getenv("LLM_PROVIDER", "")  # llm.have_llm() needs it set explicitly
+    LLM_PROVIDER = LLM_PROVIDER_ENV or "openai"
+    LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
+
+    # Dev flags
+    MOCK = os.getenv("LLM_MOCK", "0") == "1"
+    MOCK_MODE = os.getenv("LLM_MOCK_MODE", "mix").lower()  # buy|sell|hold|mix
+    FALLBACK_ON_QUOTA = os.getenv("LLM_FALLBACK_TO_MOCK_ON_QUOTA", "1") == "1"
+
+reload_config()
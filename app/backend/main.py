@@ -3,9 +3,42 @@ from fastapi import FastAPI, APIRouter
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
-import os, logging, pkgutil, importlib
-
-app = FastAPI(title="AI Hedge Fund Agents", version="0.1.0")
+from contextlib import asynccontextmanager
+from functools import lru_cache
+import os, sys, logging, asyncio, pkgutil, importlib, importlib.util
+
+from app.backend.responses import DefaultResponse
+
+def _mount_static(app: FastAPI) -> None:
+    if any(getattr(r, "name", None) == "web" for r in app.routes):
+        return  # lifespan already ran (e.g. repeated TestClient contexts)
+    # Unmounted (plain 404) when the UI isn't shipped, e.g. API-only images
+    if not os.path.isdir("web"):
+        logging.warning("No web/ directory; static UI at /web not mounted")
+        return
+    app.mount("/web", StaticFiles(directory="web", html=True, check_dir=False), name="web")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Static UI is mounted at startup rather than import, keeping it off the import path
+    _mount_static(app)
+    # Build the (memoized) OpenAPI schema now so the first /docs or /openapi.json hit doesn't pay for it
+    try:
+        app.openapi()
+    except Exception as e:
+        logging.warning(f"OpenAPI schema warm-up failed: {e}")
+    yield
+    # Release the pooled clients' keep-alive connections, if any router loaded them
+    http_client = sys.modules.get("app.backend.http_client")
+    if http_client is not None:
+        await http_client.aclose_clients()
+
+app = FastAPI(
+    title="AI Hedge Fund Agents",
+    version="0.1.0",
+    lifespan=lifespan,
+    default_response_class=DefaultResponse,
+)
 
 # --- CORS ---
 frontend_url = os.getenv("FRONTEND_URL")
@@ -19,105 +52,127 @@ app.add_middleware(
 )
 
 # --- Health & root ---
+# Trivial handlers are async so Starlette runs them inline instead of via the threadpool
 @app.get("/health")
-def health():
+async def health():
     return {"ok": True}
 
 @app.get("/")
-def root():
+async def root():
     return {"service": "ai-hedge-fund-agents", "ok": True, "ui": "/web"}
 
-# --- Try to include your existing agents/web routers (optional) ---
-try:
-    from app.backend.routers import agents as agents_router
-    app.include_router(agents_router.router)
-except Exception as e1:
+# --- Optional routers: each slot mounts the first candidate module that exists ---
+_ROUTERS = (
+    ("Agents", ("app.backend.routers.agents", "app.backend.agents.router")),
+    ("Web", ("app.backend.routers.web",)),
+    ("Market", ("app.backend.routers.market",)),
+    ("Backtest", ("app.backend.routers.backtest",)),
+)
+
+def _has_module(modpath: str) -> bool:
     try:
-        from app.backend.agents import router as agents_router2
-        app.include_router(agents_router2.router)
-    except Exception as e2:
-        logging.warning(f"Agents router not loaded: {e1} | fallback: {e2}")
-
-try:
-    from app.backend.routers import web as web_router
-    app.include_router(web_router.router)
-except Exception as e:
-    logging.warning(f"Web router not loaded: {e}")
-
-# --- Include market/backtest routers (these are the new ones you added) ---
-try:
-    from app.backend.routers import market as market_router
-    app.include_router(market_router.router)
-except Exception as e:
-    logging.warning(f"Market router not loaded: {e}")
-
-try:
-    from app.backend.routers import backtest as backtest_router
-    app.include_router(backtest_router.router)
-except Exception as e:
-    logging.warning(f"Backtest router not loaded: {e}")
+        return importlib.util.find_spec(modpath) is not None
+    except ModuleNotFoundError:  # parent package itself is missing
+        return False
+
+def _safe_include(label: str, modpaths: tuple, name: str = "router", prefix: str = "") -> None:
+    # find_spec probes the import system without running a module, so absent optional
+    # routers are skipped without raising; only real import/include failures warn
+    present = [m for m in modpaths if _has_module(m)]
+    if not present:
+        logging.debug(f"{label} router not present: {', '.join(modpaths)}")
+        return
+    errors = []
+    for modpath in present:
+        try:
+            r = getattr(importlib.import_module(modpath), name, None)
+            if r is None:
+                errors.append(f"'{modpath}' has no '{name}'")
+                continue
+            app.include_router(r, prefix=prefix)
+            return
+        except Exception as e:
+            errors.append(str(e))
+    logging.warning(f"{label} router not loaded: {' | fallback: '.join(errors)}")
+
+for _label, _modpaths in _ROUTERS:
+    _safe_include(_label, _modpaths)
 
 # ======================= DEBUG ROUTES =======================
 _debug = APIRouter(prefix="/debug", tags=["debug"])
 
 # /debug/llm-ping
-try:
-    from app.backend.agents.llm_client import chat as llm_chat
-except Exception as import_err:
-    @_debug.get("/llm-ping")
-    async def llm_ping_import_error():
-        return JSONResponse(
-            status_code=200,
-            content={
-                "ok": False,
-                "phase": "import",
-                "error": f"{type(import_err).__name__}: {import_err}",
-                "hint": "Ensure app/backend/agents/llm_client.py exists and packages have __init__.py",
-            },
-        )
-else:
-    @_debug.get("/llm-ping")
-    async def llm_ping(model: str | None = None):
+_llm_chat = None  # llm_client is imported on the first ping, not at app start
+
+@_debug.get("/llm-ping")
+async def llm_ping(model: str | None = None):
+    global _llm_chat
+    if _llm_chat is None:
         try:
-            txt = await llm_chat("Reply with exactly: PONG", model=model)
-            return {"ok": True, "model": model, "text": txt}
-        except Exception as e:
-            logging.exception("llm-ping failed")
+            from app.backend.agents.llm_client import chat as _llm_chat
+        except Exception as import_err:
             return JSONResponse(
                 status_code=200,
                 content={
                     "ok": False,
-                    "phase": "call",
-                    "error": f"{type(e).__name__}: {e}",
-                    "has_OPENAI_API_KEY": bool(os.getenv("OPENAI_API_KEY")),
-                    "LLM_PROVIDER": os.getenv("LLM_PROVIDER", "openai"),
-                    "OPENAI_BASE_URL": os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1"),
-                    "LLM_MODEL_default": os.getenv("LLM_MODEL", "gpt-4o-mini"),
-                    "hint": "401=bad key, 404=model not allowed, 429=quota. Use LLM_MOCK=1 to develop without API.",
+                    "phase": "import",
+                    "error": f"{type(import_err).__name__}: {import_err}",
+                    "hint": "Ensure app/backend/agents/llm_client.py exists and packages have __init__.py",
                 },
             )
+    try:
+        txt = await _llm_chat("Reply with exactly: PONG", model=model)
+        return {"ok": True, "model": model, "text": txt}
+    except Exception as e:
+        logging.exception("llm-ping failed")
+        return JSONResponse(
+            status_code=200,
+            content={
+                "ok": False,
+                "phase": "call",
+                "error": f"{type(e).__name__}: {e}",
+                "has_OPENAI_API_KEY": bool(os.getenv("OPENAI_API_KEY")),
+                "LLM_PROVIDER": os.getenv("LLM_PROVIDER", "openai"),
+                "OPENAI_BASE_URL": os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1"),
+                "LLM_MODEL_default": os.getenv("LLM_MODEL", "gpt-4o-mini"),
+                "hint": "401=bad key, 404=model not allowed, 429=quota. Use LLM_MOCK=1 to develop without API.",
+            },
+        )
 
 # /debug/agents-available
+@lru_cache(maxsize=1)
+def _agent_module_names() -> tuple:
+    """Scanned once; the agents package does not change while the process runs."""
+    import app.backend.agents as agents_pkg
+    names = []
+    for m in pkgutil.iter_modules(agents_pkg.__path__):
+        name = m.name
+        if name.startswith("_") or name in {"llm_client", "llm_helpers", "router", "generic", "cache"}:
+            continue
+        names.append(name)
+    return tuple(sorted(names))
+
 @_debug.get("/agents-available")
-def debug_agents_available():
+async def debug_agents_available():
+    if _agent_module_names.cache_info().currsize:
+        return {"ok": True, "agents_by_module": list(_agent_module_names())}
+
+    # First call imports and scans the agents package; keep that off the event loop
     try:
-        import app.backend.agents as agents_pkg
+        await asyncio.to_thread(importlib.import_module, "app.backend.agents")
     except Exception as e:
         return {"ok": False, "error": f"ImportError: {e}", "agents_by_module": []}
 
-    names = []
     try:
-        for m in pkgutil.iter_modules(agents_pkg.__path__):
-            name = m.name
-            if name.startswith("_") or name in {"llm_client", "llm_helpers", "router", "generic"}:
-                continue
-            names.append(name)
+        names = await asyncio.to_thread(_agent_module_names)
     except Exception as e:
         return {"ok": False, "error": f"ScanError: {e}", "agents_by_module": []}
-    return {"ok": True, "agents_by_module": sorted(names)}
+    return {"ok": True, "agents_by_module": list(names)}
 
 # /debug/agents-registry
-def _find_registry_keys():
+@lru_cache(maxsize=1)
+def _registry_dicts() -> tuple:
+    """(module, variable, dict) for every registry found; scanned once, see /agents-registry/refresh."""
     candidates = [
         "app.backend.routers.agents",
         "app.backend.agents.router",
@@ -133,13 +188,24 @@ def _find_registry_keys():
             continue
         for varname in possible_names:
             val = getattr(mod, varname, None)
-            if isinstance(val, dict) and val:
-                results.append({"module": modpath, "variable": varname, "keys": list(val.keys())})
-    return results
+            if isinstance(val, dict):
+                results.append((modpath, varname, val))
+    return tuple(results)
+
+def _find_registry_keys():
+    # Keys are read live: registries such as AGENT_IMPLS fill in lazily after the scan
+    return [
+        {"module": modpath, "variable": varname, "keys": list(val.keys())}
+        for modpath, varname, val in _registry_dicts() if val
+    ]
 
 @_debug.get("/agents-registry")
-def debug_agents_registry():
-    found = _find_registry_keys()
+async def debug_agents_registry():
+    if _registry_dicts.cache_info().currsize:
+        found = _find_registry_keys()
+    else:
+        # First scan may import agent modules; keep that off the event loop
+        found = await asyncio.to_thread(_find_registry_keys)
     if not found:
         return {
             "ok": False,
@@ -149,8 +215,10 @@ def debug_agents_registry():
         }
     return {"ok": True, "found": found}
 
+@_debug.post("/agents-registry/refresh")
+async def debug_agents_registry_refresh():
+    _registry_dicts.cache_clear()
+    return await debug_agents_registry()
+
 app.include_router(_debug)
 # ===================== END DEBUG ROUTES =====================
-
-# --- Static UI at /web ---
-app.mount("/web", StaticFiles(directory="web", html=True), name="web")
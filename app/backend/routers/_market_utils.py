@@ -0,0 +1,221 @@
+# app/backend/routers/_market_utils.py
+# Price fetching shared by the market router and the technicals agent: Yahoo chart bars
+# with a Stooq CSV fallback, cached and returned as columns.
+from fastapi import HTTPException
+import logging, io
+from calendar import timegm
+from typing import Dict, Any, List, Literal, Tuple
+from datetime import datetime, timedelta, timezone
+import numpy as np
+
+try:
+    import pandas as pd  # optional; C CSV parser for the Stooq dump
+except Exception:
+    pd = None
+
+from app.backend.cache import TTLCache
+from app.backend import http_client
+from app.backend.http_client import body_snippet, read_json, stream_snippet
+
+# ticker -> full parsed Stooq history (end-of-day data; every range is sliced from it)
+_STOOQ_HISTORY = TTLCache(maxsize=512, ttl=3600)
+# (ticker, range, interval) -> Yahoo bars; TTL set per interval in _fetch_yahoo_bars
+_YAHOO_BARS = TTLCache(maxsize=512)
+
+def _as_list(x):
+    return x if isinstance(x, list) else (x or [])
+
+# Bars travel as columns {"t": [...], "o": [...], ...}: one list per field instead of a dict per bar
+Bars = Dict[str, List[Any]]
+_BAR_FIELDS = ("t", "o", "h", "l", "c", "v")
+
+def _column(x: List[Any], n: int) -> np.ndarray:
+    """Float column of length n; None and missing trailing entries become nan."""
+    out = np.full(n, np.nan)
+    m = min(n, len(x))
+    out[:m] = np.array(x[:m], dtype=np.float64)
+    return out
+
+def _bar_columns(*arrays: np.ndarray) -> Bars:
+    return {k: a.tolist() for k, a in zip(_BAR_FIELDS, arrays)}
+
+def _bar_rows(bars: Bars) -> List[Dict[str, Any]]:
+    """Legacy [{t, o, h, l, c, v}, ...] shape, for format=rows."""
+    return [dict(zip(_BAR_FIELDS, row)) for row in zip(*(bars[k] for k in _BAR_FIELDS))]
+
+_LOOKBACK_DAYS = {
+    "1mo": 22, "3mo": 66, "6mo": 126, "ytd": 252, "1y": 252,
+    "2y": 504, "5y": 1260, "10y": 2520
+}
+
+def _range_to_lookback_days(r: str) -> int:
+    return _LOOKBACK_DAYS.get((r or "").lower(), 252)
+
+# ---------------------- Yahoo v8 chart ----------------------
+# The ranges/intervals the chart API accepts; validated as plain membership checks, not a regex
+YahooRange = Literal["1d", "5d", "1mo", "3mo", "6mo", "ytd", "1y", "2y", "5y", "10y", "max"]
+YahooInterval = Literal["1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h", "1d", "5d", "1wk", "1mo", "3mo"]
+
+# Intraday bars go stale quickly; daily and longer bars are kept like the Stooq history
+_INTRADAY = {"1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h"}
+
+async def _fetch_yahoo_bars(ticker: str, rng: str, interval: str) -> Bars:
+    """Cached per (ticker, range, interval); concurrent requests for the same bars share one call."""
+    ttl = 300 if interval in _INTRADAY else 3600
+    return await _YAHOO_BARS.get_or_load(
+        (ticker, rng, interval), lambda: _fetch_yahoo_bars_raw(ticker, rng, interval), ttl=ttl,
+    )
+
+async def _fetch_yahoo_bars_raw(ticker: str, rng: str, interval: str) -> Bars:
+    url = f"https://query1.finance.yahoo.com/v8/finance/chart/{ticker}"
+    params = {"range": rng, "interval": interval, "events": "div,splits"}
+    headers = {"Accept": "application/json"}
+
+    # Streamed so error responses are rejected on the status line, without buffering their body
+    async with http_client.DATA_CLIENT.stream("GET", url, params=params, headers=headers) as r:
+        if r.status_code != 200:
+            raise HTTPException(502, f"Yahoo error {r.status_code}: {await stream_snippet(r)}")
+        await r.aread()
+
+    try:
+        data = read_json(r)
+        chart = data.get("chart") or {}
+        if chart.get("error"):
+            raise HTTPException(502, f"Yahoo chart error: {chart['error']}")
+        results = chart.get("result") or []
+        if not results:
+            raise HTTPException(502, "Yahoo returned empty result")
+
+        res = results[0]
+        ts = _as_list(res.get("timestamp"))
+        indicators = res.get("indicators") or {}
+        quotes = _as_list(indicators.get("quote"))
+        q0 = quotes[0] if quotes else {}
+        opens  = _as_list(q0.get("open"))
+        highs  = _as_list(q0.get("high"))
+        lows   = _as_list(q0.get("low"))
+        closes = _as_list(q0.get("close"))
+        vols   = _as_list(q0.get("volume"))
+
+        n = len(ts)
+        c = _column(closes, n)
+        mask = ~np.isnan(c)
+        if not mask.any():
+            raise HTTPException(404, "Yahoo returned no price bars.")
+        c = c[mask]
+        o, h, l = (np.where(np.isnan(x), c, x) for x in (_column(opens, n)[mask], _column(highs, n)[mask], _column(lows, n)[mask]))
+        v = np.nan_to_num(_column(vols, n)[mask]).astype(np.int64)
+        t_ms = np.array(ts, dtype=np.int64)[mask] * 1000
+        return _bar_columns(t_ms, o, h, l, c, v)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.exception("Yahoo parse error")
+        logging.debug("Yahoo payload: %s", body_snippet(r))
+        raise HTTPException(502, f"Unexpected Yahoo payload: {type(e).__name__}: {e}")
+
+# ---------------------- Stooq CSV fallback ----------------------
+_STOOQ_COLS = ["Date", "Open", "High", "Low", "Close", "Volume"]
+
+# Parsed history is kept columnar: (t_ms int64[N], o/h/l/c/v float64[N, 5]), sorted by t
+StooqHistory = Tuple[np.ndarray, np.ndarray]
+
+def _empty_history() -> StooqHistory:
+    return np.empty(0, dtype=np.int64), np.empty((0, 5), dtype=np.float64)
+
+def _history_cutoff() -> str:
+    """
+    Oldest date any range can reach (longest lookback in trading days, x1.5 as calendar
+    days), as 'YYYY-MM-DD'. ISO dates order as strings, so older CSV rows are dropped by
+    a plain string compare before any parsing; the dumps often go back decades.
+    """
+    days = int(max(_LOOKBACK_DAYS.values()) * 1.5)
+    return (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%d")
+
+def _parse_stooq_csv(csv_text: str) -> StooqHistory:
+    """
+    Returns (t_ms, ohlcv) arrays sorted ascending; bars are only materialized for the
+    slice a request asks for (see _fetch_stooq_bars).
+    CSV columns: Date,Open,High,Low,Close,Volume
+    """
+    if pd is None:
+        return _parse_stooq_csv_py(csv_text)
+    try:
+        df = pd.read_csv(io.StringIO(csv_text), usecols=_STOOQ_COLS)
+        df = df[df["Date"] >= _history_cutoff()]
+    except Exception:
+        return _empty_history()
+    dates = pd.to_datetime(df["Date"], format="%Y-%m-%d", errors="coerce")  # naive dates are UTC days
+    vals = df[_STOOQ_COLS[1:]].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)
+    ok = dates.notna().to_numpy() & ~np.isnan(vals).any(axis=1)  # drop malformed rows
+    t_ms = dates.to_numpy()[ok].astype("datetime64[ms]").astype(np.int64)
+    vals = vals[ok]
+    vals[:, 4] = np.trunc(vals[:, 4])  # integer volumes, like int(float(v))
+    order = np.argsort(t_ms, kind="stable")
+    return t_ms[order], vals[order]
+
+def _iso_date_to_ms(d: str) -> int:
+    """'YYYY-MM-DD' -> UTC midnight in epoch ms, by slicing instead of strptime."""
+    if len(d) != 10 or d[4] != "-" or d[7] != "-":
+        raise ValueError(f"not an ISO date: {d!r}")
+    return timegm((int(d[0:4]), int(d[5:7]), int(d[8:10]), 0, 0, 0)) * 1000
+
+def _parse_stooq_csv_py(csv_text: str) -> StooqHistory:
+    """Pure-Python fallback for _parse_stooq_csv when pandas is not installed."""
+    rows = []
+    lines = csv_text.strip().splitlines()
+    if not lines or len(lines) < 2:
+        return _empty_history()
+    cutoff = _history_cutoff()
+    for line in lines[1:]:
+        if line < cutoff:
+            continue
+        parts = line.strip().split(',')
+        if len(parts) < 6:
+            continue
+        d, o, h, l, c, v = parts[:6]
+        try:
+            t_ms = _iso_date_to_ms(d)
+            o = float(o); h = float(h); l = float(l); c = float(c); v = int(float(v))
+            rows.append((t_ms, o, h, l, c, v))
+        except Exception:
+            continue
+    if not rows:
+        return _empty_history()
+    rows.sort(key=lambda x: x[0])
+    return np.array([r[0] for r in rows], dtype=np.int64), np.array([r[1:] for r in rows], dtype=np.float64)
+
+def _stooq_candidates(tkr: str) -> List[str]:
+    """
+    Stooq often needs the '.us' suffix for US symbols (e.g., aapl.us).
+    Try both plain lower and lower+'.us'.
+    """
+    t = (tkr or "").lower()
+    cands = [t]
+    if not t.endswith(".us"):
+        cands.append(f"{t}.us")
+    return cands
+
+async def _fetch_stooq_bars(ticker: str, rng: str) -> Bars:
+    t, vals = await _STOOQ_HISTORY.get_or_load(ticker, lambda: _fetch_stooq_rows(ticker))
+    if (rng or "").lower() == "ytd" and len(t):
+        # t is sorted, so the calendar window starts at one binary search
+        jan1 = datetime.fromtimestamp(int(t[-1]) / 1000, tz=timezone.utc).replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+        lo = int(np.searchsorted(t, int(jan1.timestamp() * 1000), side="left"))
+    else:
+        lo = max(0, len(t) - _range_to_lookback_days(rng))
+    o, h, l, c, v = vals[lo:].T
+    return _bar_columns(t[lo:], o, h, l, c, v.astype(np.int64))
+
+async def _fetch_stooq_rows(ticker: str) -> StooqHistory:
+    candidates = _stooq_candidates(ticker)
+    last_err = None
+    for sym in candidates:
+        url = f"https://stooq.com/q/d/l/?s={sym}&i=d"
+        r = await http_client.DATA_CLIENT.get(url)
+        if r.status_code == 200 and "Date,Open,High,Low,Close,Volume" in r.text:
+            history = _parse_stooq_csv(r.text)
+            if len(history[0]):
+                return history
+        last_err = f"{r.status_code}: {body_snippet(r, 120)}"
+    raise HTTPException(404, f"Stooq returned no rows for {ticker} (tried {candidates}). Last: {last_err}")
@@ -1,10 +1,13 @@
 # app/backend/routers/agents.py
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
-import os, re, logging, asyncio, pkgutil, importlib, statistics
+from typing import Optional, List, Dict, Any, Tuple
+import os, re, logging, asyncio, pkgutil, importlib, inspect
+from functools import lru_cache, partial
+import httpx
+import numpy as np
 
-from app.backend.agents.llm_client import chat as llm_chat
+from app.backend.responses import DefaultResponse
 
 router = APIRouter(prefix="/agents", tags=["agents"])
 
@@ -33,17 +36,34 @@ class SignalRequest(BaseModel):
 # ----------------------- Helpers -----------------------
 VAL = {"buy": 1, "hold": 0, "sell": -1}
 
+# Compiled once; both parsers run on every agent reply
+_FINAL_ACTION_RE = re.compile(r'final\s*action\s*:\s*(buy|sell|hold)\b', re.I)
+_CONFIDENCE_RE = re.compile(r'confidence\s*:\s*([0-9]+(?:\.[0-9]+)?)', re.I)
+
+def _is_word_at(low: str, i: int, n: int) -> bool:
+    """True when low[i:i+n] is a whole word (same boundaries as regex \\b)."""
+    before = low[i - 1] if i else " "
+    after = low[i + n] if i + n < len(low) else " "
+    return not (before.isalnum() or before == "_" or after.isalnum() or after == "_")
+
+def _first_action(text: str) -> str:
+    """First whole-word buy/sell/hold in the text; str.find scans beat a case-insensitive regex ~4x."""
+    low = text.lower()
+    best, action = len(low), "hold"
+    for kw in ("buy", "sell", "hold"):
+        i = low.find(kw, 0, best)
+        while i != -1 and not _is_word_at(low, i, len(kw)):
+            i = low.find(kw, i + 1, best)
+        if i != -1:
+            best, action = i, kw
+    return action
+
 def _parse_action(text: str) -> str:
     if not text:
         return "hold"
-    m = re.search(r'final\s*action\s*:\s*(buy|sell|hold)\b', text, re.I)
-    if m:
-        return m.group(1).lower()
-    low = text.lower()
-    for kw in ("buy", "sell", "hold"):
-        if kw in low:
-            return kw
-    return "hold"
+    m = _FINAL_ACTION_RE.search(text)
+    # No explicit "Final action:" line -> first buy/sell/hold word in the text
+    return m.group(1).lower() if m else _first_action(text)
 
 def _parse_confidence(text: str) -> Optional[float]:
     """
@@ -51,7 +71,7 @@ def _parse_confidence(text: str) -> Optional[float]:
     """
     if not text:
         return None
-    m = re.search(r'confidence\s*:\s*([0-9]+(?:\.[0-9]+)?)', text, re.I)
+    m = _CONFIDENCE_RE.search(text)
     if not m:
         return None
     v = float(m.group(1))
@@ -59,6 +79,9 @@ def _parse_confidence(text: str) -> Optional[float]:
         v = v / 100.0
     return max(0.0, min(1.0, v))
 
+# The persona reply is complete once its last line ("Confidence: <n>") has been streamed
+_REPLY_DONE_RE = re.compile(r'confidence\s*:\s*[0-9]+(?:\.[0-9]+)?%?\s', re.I)
+
 def _persona_prompt(persona: str, ticker: str, req: SignalRequest) -> str:
     risk = (req.risk or "").lower()
     note = (req.context or {}).get("note", "")
@@ -72,149 +95,274 @@ def _persona_prompt(persona: str, ticker: str, req: SignalRequest) -> str:
         f"Confidence: <a number between 0.0 and 1.0>\n"
     )
 
+_LLM_CHAT = None  # llm_client (httpx client, env config) loads on the first persona call
+
+def _llm_chat():
+    global _LLM_CHAT
+    if _LLM_CHAT is None:
+        from app.backend.agents.llm_client import chat
+        _LLM_CHAT = chat
+    return _LLM_CHAT
+
+def _persona_decision(persona: str, txt: Optional[str]) -> Dict[str, Any]:
+    txt = (txt or "").strip()
+    action = _parse_action(txt)
+    conf = _parse_confidence(txt)
+    if conf is None:
+        # Fallback heuristic: any directional call gets a bit higher confidence than hold
+        conf = 0.65 if action in ("buy", "sell") else 0.55
+    return {"agent": persona.lower(), "action": action, "confidence": float(conf), "rationale": txt}
+
 def persona_agent(persona: str):
     async def run(ticker: str, req: SignalRequest) -> Dict[str, Any]:
-        txt = await llm_chat(_persona_prompt(persona, ticker, req), model=req.llm_model)
-        txt = (txt or "").strip()
-        action = _parse_action(txt)
-        conf = _parse_confidence(txt)
-        if conf is None:
-            # Fallback heuristic: any directional call gets a bit higher confidence than hold
-            conf = 0.65 if action in ("buy", "sell") else 0.55
-        return {"agent": persona.lower(), "action": action, "confidence": float(conf), "rationale": txt}
+        txt = await _llm_chat()(_persona_prompt(persona, ticker, req), model=req.llm_model, stop_at=_REPLY_DONE_RE)
+        return _persona_decision(persona, txt)
     return run
 
 # ----------------------- Agent registry -----------------------
-# Built-in personas (always available)
-AGENT_IMPLS: Dict[str, Any] = {
-    "buffett": persona_agent("Buffett"),
-    "munger": persona_agent("Munger"),
-    "technicals": persona_agent("Technicals"),
-}
+# Per-agent deadline inside a /signal fan-out, so one stuck call can't hold the whole batch
+AGENT_TIMEOUT_S = float(os.getenv("AGENT_TIMEOUT_S", "60"))
+# Caps agents running at once across all /signal requests (module agents may hit yfinance etc.)
+AGENT_SEMAPHORE = asyncio.Semaphore(int(os.getenv("AGENT_CONCURRENCY", "8")))
+
+# Built-in personas (always available); the only agents /signal/batch can queue
+PERSONAS = {"buffett": "Buffett", "munger": "Munger", "technicals": "Technicals"}
+AGENT_IMPLS: Dict[str, Any] = {name: persona_agent(persona) for name, persona in PERSONAS.items()}
 
 # Also auto-load any modules under app/backend/agents that expose a `run()` function.
 # Keys will be the module names (e.g., "value", "quality", "ta", etc.).
-try:
-    import app.backend.agents as agents_pkg
-    for m in pkgutil.iter_modules(agents_pkg.__path__):
-        name = m.name
-        if name.startswith("_") or name in {"llm_client", "llm_helpers", "router"}:
-            continue
-        try:
-            mod = importlib.import_module(f"app.backend.agents.{name}")
-            fn = getattr(mod, "run", None)
-            if callable(fn):
-                AGENT_IMPLS[name] = fn  # dynamic agent available via its module name
-        except Exception as e:
-            logging.warning(f"Skipping agent module '{name}': {e}")
-except Exception as e:
-    logging.warning(f"Could not scan agents package: {e}")
+# The scan imports every module, so it runs on first use rather than at import time.
+@lru_cache(maxsize=1)
+def _agent_impls() -> Dict[str, Any]:
+    try:
+        import app.backend.agents as agents_pkg
+        for m in pkgutil.iter_modules(agents_pkg.__path__):
+            name = m.name
+            if name.startswith("_") or name in {"llm_client", "llm_helpers", "router", "cache"}:
+                continue
+            try:
+                mod = importlib.import_module(f"app.backend.agents.{name}")
+                fn = getattr(mod, "run", None)
+                if callable(fn):
+                    AGENT_IMPLS[name] = fn  # dynamic agent available via its module name
+            except Exception as e:
+                logging.warning(f"Skipping agent module '{name}': {e}")
+    except Exception as e:
+        logging.warning(f"Could not scan agents package: {e}")
+    return AGENT_IMPLS
+
+@lru_cache(maxsize=1)
+def _default_agents() -> Tuple[str, ...]:
+    # default to first three registered agents (fixed once the scan has run)
+    return tuple(_agent_impls())[:3]
 
 def _select_agents(requested: Optional[List[str]]) -> List[str]:
     if not requested:
-        # default to first three registered agents
-        return list(AGENT_IMPLS.keys())[:3]
-    selected = [a for a in requested if a in AGENT_IMPLS]
-    unknown = [a for a in requested if a not in AGENT_IMPLS]
+        return list(_default_agents())
+    impls = _agent_impls()
+    selected: List[str] = []
+    unknown: List[str] = []
+    for a in requested:
+        (selected if a in impls else unknown).append(a)
     if unknown:
         logging.warning(f"Ignoring unknown agents: {unknown}")
-    if not selected:
-        selected = list(AGENT_IMPLS.keys())[:3]
-    return selected
+    return selected or list(_default_agents())
 
-async def _run_one_agent(agent_name: str, ticker: str, req: SignalRequest) -> Dict[str, Any]:
-    impl = AGENT_IMPLS[agent_name]
-    # Try flexible call signatures for dynamically loaded modules
+@lru_cache(maxsize=None)
+def _call_style(impl: Any) -> Tuple[bool, bool]:
+    """
+    (positional, is_coro) for an agent callable, worked out once per impl.
+    positional=True -> impl(ticker, req); otherwise the keyword form used by module agents.
+    """
     try:
-        if asyncio.iscoroutinefunction(impl):
-            return await impl(ticker, req)
-        return impl(ticker, req)
+        inspect.signature(impl).bind(None, None)
+        positional = True
     except TypeError:
-        try:
-            if asyncio.iscoroutinefunction(impl):
-                return await impl(ticker=ticker, model=req.llm_model, risk=req.risk, budget=req.budget, context=req.context)
-            return impl(ticker=ticker, model=req.llm_model, risk=req.risk, budget=req.budget, context=req.context)
-        except Exception as e:
-            return {"agent": agent_name, "action": "hold", "confidence": 0.5, "rationale": f"Agent error: {e}"}
+        positional = False
+    except ValueError:  # no introspectable signature; try the common form
+        positional = True
+    return positional, asyncio.iscoroutinefunction(impl)
+
+async def _run_one_agent(agent_name: str, ticker: str, req: SignalRequest) -> Dict[str, Any]:
+    impl = _agent_impls()[agent_name]
+    positional, is_coro = _call_style(impl)
+    # Sync agents may block on network I/O (yfinance and the like); run them on a worker
+    # thread so the other agents and requests sharing the loop keep going
+    call = impl if is_coro else partial(asyncio.to_thread, impl)
+    if positional:
+        return await call(ticker, req)
+    # Flexible keyword signature for dynamically loaded modules
+    try:
+        return await call(ticker=ticker, model=req.llm_model, risk=req.risk, budget=req.budget, context=req.context)
+    except Exception as e:
+        return {"agent": agent_name, "action": "hold", "confidence": 0.5, "rationale": f"Agent error: {e}"}
+
+async def _run_bounded(agent_name: str, ticker: str, req: SignalRequest) -> Dict[str, Any]:
+    # The deadline starts once a slot is free, so queueing behind other agents doesn't time out
+    async with AGENT_SEMAPHORE:
+        return await asyncio.wait_for(_run_one_agent(agent_name, ticker, req), AGENT_TIMEOUT_S)
+
+def _normalize_decision(agent_name: str, res: Any) -> Dict[str, Any]:
+    if isinstance(res, asyncio.TimeoutError):
+        return {"agent": agent_name, "action": "hold", "confidence": 0.55, "rationale": f"Agent timed out after {AGENT_TIMEOUT_S:g}s"}
+    try:
+        if isinstance(res, BaseException):
+            raise res
+        return {
+            "agent": res.get("agent", agent_name),
+            "action": res.get("action", "hold"),
+            "confidence": float(res.get("confidence", 0.55)),
+            "rationale": res.get("rationale", ""),
+        }
+    except Exception as e:
+        return {"agent": agent_name, "action": "hold", "confidence": 0.55, "rationale": f"Agent runtime error: {e}"}
 
 # Keep VAL = {"buy": 1, "hold": 0, "sell": -1} above
 
 # Optional persona weights (you can tweak or remove)
 WEIGHTS = {"buffett": 0.45, "munger": 0.35, "technicals": 0.20}
 
-def _final_vote(decisions: List[Dict[str, Any]]) -> Dict[str, Any]:
+# Bound lookups for the scoring hot path
+_VAL_GET = VAL.get
+_WEIGHT_GET = WEIGHTS.get
+
+def _final_votes(panel: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
     """
-    Confidence- and persona-weighted consensus:
+    Confidence- and persona-weighted consensus for every ticker at once
+    (panel[i] = the decisions for ticker i, same length per ticker):
     final_score in [-1, 1], where + is buy-lean and - is sell-lean.
     """
-    # Build weighted sum
-    num = 0.0
-    den = 0.0
-    confs = []
-
-    for d in decisions:
-        agent = str(d.get("agent", "")).lower()
-        v = VAL.get(d.get("action"), 0)
-        c = float(d.get("confidence", 0.55))
-        w_agent = WEIGHTS.get(agent, 0.25)  # default small weight if unknown
-        w = max(0.05, min(1.0, c)) * w_agent  # combine persona weight & confidence
-        num += w * v
-        den += w
-        confs.append(c)
-
-    score = (num / den) if den > 0 else 0.0  # -1..1
+    rows, n = len(panel), len(panel[0]) if panel else 0
+    cells = [d for decisions in panel for d in decisions]
+    vals = np.fromiter((_VAL_GET(d.get("action"), 0) for d in cells), dtype=np.int8, count=rows * n).reshape(rows, n)
+    confs = np.fromiter((float(d.get("confidence", 0.55)) for d in cells), dtype=np.float64, count=rows * n).reshape(rows, n)
+    w_agent = np.fromiter(
+        (_WEIGHT_GET(str(d.get("agent", "")).lower(), 0.25) for d in cells), dtype=np.float64, count=rows * n,
+    ).reshape(rows, n)
 
-    # Thresholds for decision
-    final_vote = "buy" if score > 0.15 else "sell" if score < -0.15 else "hold"
+    # Per decision: persona weight x clamped confidence
+    w = np.clip(confs, 0.05, 1.0) * w_agent
+    num, den = (w * vals).sum(axis=1), w.sum(axis=1)
+    score = np.divide(num, den, out=np.zeros(rows), where=den > 0)  # -1..1
 
     # Overall confidence: blend avg agent confidence with agreement strength
-    import statistics
-    avg_conf = statistics.mean(confs) if confs else 0.55
-    agreement = abs(score)  # 0..1
-    final_confidence = max(0.05, min(0.95, 0.5 * avg_conf + 0.5 * agreement))
-
-    return {
-        "final_vote": final_vote,
-        "final_score": round(score, 3),
-        "final_confidence": round(final_confidence, 2),
-    }
+    avg_conf = confs.mean(axis=1) if n else np.full(rows, 0.55)
+    final_confidence = np.clip(0.5 * avg_conf + 0.5 * np.abs(score), 0.05, 0.95)
+
+    # Thresholds for decision
+    return [
+        {
+            "final_vote": "buy" if s > 0.15 else "sell" if s < -0.15 else "hold",
+            "final_score": round(s, 3),
+            "final_confidence": round(c, 2),
+        }
+        for s, c in zip(score.tolist(), final_confidence.tolist())
+    ]
+
+def _final_vote(decisions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return _final_votes([decisions])[0]
 
 
 # ----------------------- Routes -----------------------
-@router.post("/signal")
-async def signal(req: SignalRequest) -> Dict[str, Any]:
+# Results are built internally, so skip response-model validation and hand them straight to the encoder
+@router.post("/signal", response_model=None)
+async def signal(req: SignalRequest) -> DefaultResponse:
     tickers = req.resolved_tickers()
     if not tickers:
         raise HTTPException(status_code=422, detail="Provide either `tickers` (array) or `symbol` (string).")
 
     agent_names = _select_agents(req.agents)
 
-    out_results: List[Dict[str, Any]] = []
-    for t in tickers:
-        decisions: List[Dict[str, Any]] = []
-        for a in agent_names:
-            try:
-                res = await _run_one_agent(a, t, req)
-                # normalize shape
-                res = {
-                    "agent": res.get("agent", a),
-                    "action": res.get("action", "hold"),
-                    "confidence": float(res.get("confidence", 0.55)),
-                    "rationale": res.get("rationale", ""),
-                }
-            except Exception as e:
-                res = {"agent": a, "action": "hold", "confidence": 0.55, "rationale": f"Agent runtime error: {e}"}
-            decisions.append(res)
+    # Fan out every (ticker, agent) pair at once; gather keeps input order
+    flat = await asyncio.gather(
+        *(_run_bounded(a, t, req) for t in tickers for a in agent_names),
+        return_exceptions=True,
+    )
 
-        fv = _final_vote(decisions)
-        out_results.append({
-            "ticker": t,
-            "decisions": decisions,
-            **fv
-        })
+    n = len(agent_names)
+    panel = [
+        [_normalize_decision(a, res) for a, res in zip(agent_names, flat[i * n:(i + 1) * n])]
+        for i in range(len(tickers))
+    ]
+    out_results: List[Dict[str, Any]] = [
+        {"ticker": t, "decisions": decisions, **fv}
+        for t, decisions, fv in zip(tickers, panel, _final_votes(panel))
+    ]
 
-    return {
+    return DefaultResponse({
         "mode": req.mode,
         "llm_model": req.llm_model,
         "results": out_results
+    })
+
+# Batch custom_ids carry each cell's position, so results are rebuilt in request order
+# without storing the ticker/agent lists in the batch metadata (capped at 512 chars)
+def _batch_id(i: int, j: int, ticker: str, agent: str) -> str:
+    return f"{i}:{j}:{ticker}:{agent}"
+
+@router.post("/signal/batch")
+async def signal_batch(req: SignalRequest) -> Dict[str, Any]:
+    """
+    Queues every (ticker, persona) prompt as one OpenAI Batch job (half the token price,
+    results within 24h). Poll GET /agents/signal/batch/{batch_id} for the /signal result.
+    """
+    tickers = req.resolved_tickers()
+    if not tickers:
+        raise HTTPException(status_code=422, detail="Provide either `tickers` (array) or `symbol` (string).")
+    agent_names = [a for a in _select_agents(req.agents) if a in PERSONAS]
+    if not agent_names:
+        raise HTTPException(status_code=422, detail=f"Batch mode runs the LLM personas only: {sorted(PERSONAS)}")
+
+    from app.backend.agents import llm_client
+    prompts = {
+        _batch_id(i, j, t, a): _persona_prompt(PERSONAS[a], t, req)
+        for i, t in enumerate(tickers) for j, a in enumerate(agent_names)
     }
+    try:
+        batch = await llm_client.submit_batch(prompts, model=req.llm_model)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"OpenAI batch submit failed: {e}")
+    return {"mode": "batch", "batch_id": batch["id"], "status": batch.get("status")}
+
+@router.get("/signal/batch/{batch_id}", response_model=None)
+async def signal_batch_result(batch_id: str):
+    from app.backend.agents import llm_client
+    try:
+        batch, replies = await llm_client.batch_results(batch_id)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"OpenAI batch lookup failed: {e}")
+    if replies is None:
+        return {"mode": "batch", "batch_id": batch_id, "status": batch.get("status"),
+                "request_counts": batch.get("request_counts")}
+
+    tickers: Dict[int, str] = {}
+    agent_names: Dict[int, str] = {}
+    for cid in replies:
+        i, j, rest = cid.split(":", 2)
+        t, a = rest.rsplit(":", 1)  # tickers may contain ":" (e.g. "XNAS:AAPL")
+        tickers[int(i)], agent_names[int(j)] = t, a
+
+    panel = []
+    for i in sorted(tickers):
+        decisions = []
+        for j in sorted(agent_names):
+            a = agent_names[j]
+            txt = replies.get(_batch_id(i, j, tickers[i], a))
+            decisions.append(
+                _persona_decision(PERSONAS.get(a, a), txt) if txt is not None
+                else {"agent": a, "action": "hold", "confidence": 0.55, "rationale": "Batch request failed"}
+            )
+        panel.append(decisions)
+
+    return DefaultResponse({
+        "mode": "batch",
+        "llm_model": (batch.get("metadata") or {}).get("model"),
+        "results": [
+            {"ticker": t, "decisions": decisions, **fv}
+            for t, decisions, fv in zip((tickers[i] for i in sorted(tickers)), panel, _final_votes(panel))
+        ],
+    })
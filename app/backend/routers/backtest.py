@@ -1,87 +1,82 @@
 # app/backend/routers/backtest.py
 from fastapi import APIRouter, HTTPException
-import httpx, math
-from typing import Dict, Any, List
+import math
+import numpy as np
+from typing import Dict, Any, List, Tuple
 
-router = APIRouter(prefix="/backtest", tags=["backtest"])
+from app.backend.responses import DefaultResponse
+from app.backend.routers._market_utils import _fetch_yahoo_bars
 
-def _sma(vals: List[float | None], n: int) -> List[float | None]:
-    out, s = [], 0.0
-    q: List[float] = []
-    for x in vals:
-        if x is None:
-            out.append(None)
-            continue
-        q.append(x); s += x
-        if len(q) > n:
-            s -= q.pop(0)
-        out.append(s/len(q) if len(q) >= n else None)
-    return out
+router = APIRouter(prefix="/backtest", tags=["backtest"])
 
-@router.post("/sma")
-async def sma_backtest(payload: Dict[str, Any]) -> Dict[str, Any]:
+def _smas(arr: np.ndarray, *windows: int) -> Tuple[np.ndarray, ...]:
     """
-    Simple moving-average crossover demo backtest.
-    Body: { symbol, range='1y', fast=20, slow=50, initial_cash=10000 }
+    Trailing means over the last `n` non-missing values for each window n (nan in -> nan out),
+    all taken from one cumulative sum instead of a sliding Python window per SMA.
     """
-    symbol = (payload.get("symbol") or payload.get("ticker") or "").upper()
-    if not symbol:
-        raise HTTPException(422, "symbol required")
-    rng = str(payload.get("range", "1y"))
-    fast = int(payload.get("fast", 20))
-    slow = int(payload.get("slow", 50))
-    cash0 = float(payload.get("initial_cash", 10000))
+    valid = np.flatnonzero(~np.isnan(arr))
+    cs = np.concatenate(([0.0], np.cumsum(arr[valid])))
+    outs = []
+    for n in windows:
+        out = np.full(arr.shape, np.nan)
+        if n > 0 and len(valid) >= n:
+            out[valid[n - 1:]] = (cs[n:] - cs[:-n]) / n
+        outs.append(out)
+    return tuple(outs)
 
-    url = f"https://query1.finance.yahoo.com/v8/finance/chart/{symbol}"
-    params = {"range": rng, "interval": "1d"}
-    headers = {"User-Agent": "Mozilla/5.0"}
-    async with httpx.AsyncClient(timeout=25.0) as client:
-        r = await client.get(url, params=params, headers=headers)
-    if r.status_code != 200:
-        raise HTTPException(502, f"Yahoo error {r.status_code}: {r.text[:200]}")
-    data = r.json()
-    result = (data.get("chart") or {}).get("result") or []
-    if not result:
-        raise HTTPException(502, "Yahoo returned no result")
+def _sma(arr: np.ndarray, n: int) -> np.ndarray:
+    return _smas(arr, n)[0]
 
-    res = result[0]
-    ts = res["timestamp"]
-    closes = res["indicators"]["quote"][0]["close"]
+def _run_crossover(ts: List[int], closes: List[float | None], fast: int, slow: int, cash0: float) -> Tuple[float, List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Long when fast SMA > slow SMA, flat otherwise; all-in on entry, liquidate at the end.
+    Only the handful of entry/exit bars are visited in Python; cash, position and
+    equity per bar are filled in as step arrays. Returns (final cash, trades, equity).
+    """
+    c = np.asarray(closes, dtype=np.float64)  # None -> nan
+    sf, ss = _smas(c, fast, slow)
+    idx = np.flatnonzero(~(np.isnan(c) | np.isnan(sf) | np.isnan(ss)))  # bars with a signal
+    long = sf[idx] > ss[idx]
 
-    sma_fast = _sma(closes, fast)
-    sma_slow = _sma(closes, slow)
+    # Runs of consecutive long signals: [starts[k], ends[k]) in signal-bar space
+    edges = np.diff(long.astype(np.int8), prepend=0, append=0)
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
 
-    pos = 0  # shares
-    bal = cash0
+    # Per-bar cash / share deltas; the running sums give the state after each bar
+    d_bal = np.zeros(len(c))
+    d_pos = np.zeros(len(c))
+    if len(c):
+        d_bal[0] = cash0
+    bal, pos = cash0, 0
     trades: List[Dict[str, Any]] = []
-    equity: List[Dict[str, Any]] = []
-
-    for i, t in enumerate(ts):
-        c = closes[i]
-        f, s = sma_fast[i], sma_slow[i]
-        if c is None or f is None or s is None:
-            equity.append({"t": t*1000, "equity": bal + (pos*c if c else 0.0)})
+    for k0, k1 in zip(starts.tolist(), ends.tolist()):
+        # Enter on the first bar of the run we can afford at least one share
+        run = idx[k0:k1]
+        affordable = np.flatnonzero(np.floor(bal / c[run]) > 0)
+        if not len(affordable):
             continue
+        i = int(run[affordable[0]])
+        shares = math.floor(bal / closes[i])
+        pos = shares
+        bal -= shares * closes[i]
+        d_bal[i] -= shares * closes[i]
+        d_pos[i] += shares
+        trades.append({"t": ts[i]*1000, "side": "buy", "price": closes[i], "shares": shares})
 
-        # Signals: long when fast>slow, flat when fast<slow
-        long = 1 if f > s else 0
-        have = 1 if pos > 0 else 0
-
-        # Enter
-        if long and not have:
-            shares = math.floor(bal / c)
-            if shares > 0:
-                pos = shares
-                bal -= shares * c
-                trades.append({"t": t*1000, "side": "buy", "price": c, "shares": shares})
-
-        # Exit
-        if not long and have:
-            bal += pos * c
-            trades.append({"t": t*1000, "side": "sell", "price": c, "shares": pos})
+        # Exit on the first signal bar after the run (if any)
+        if k1 < len(idx):
+            j = int(idx[k1])
+            bal += pos * closes[j]
+            d_bal[j] += pos * closes[j]
+            d_pos[j] -= pos
+            trades.append({"t": ts[j]*1000, "side": "sell", "price": closes[j], "shares": pos})
             pos = 0
 
-        equity.append({"t": t*1000, "equity": bal + pos * c})
+    bal_t = np.cumsum(d_bal)
+    pos_t = np.cumsum(d_pos)
+    eq = bal_t + pos_t * np.where(np.isnan(c), 0.0, c)
+    t_ms = (np.asarray(ts, dtype=np.int64) * 1000).tolist()
+    equity = [{"t": t, "equity": e} for t, e in zip(t_ms, eq.tolist())]
 
     # Liquidate at end if still long
     if pos > 0 and closes[-1] is not None:
@@ -89,7 +84,35 @@ async def sma_backtest(payload: Dict[str, Any]) -> Dict[str, Any]:
         trades.append({"t": ts[-1]*1000, "side": "sell", "price": closes[-1], "shares": pos})
         pos = 0
 
-    return {
+    return bal, trades, equity
+
+async def _daily_closes(symbol: str, rng: str) -> Tuple[List[int], List[float]]:
+    """
+    (timestamps in s, closes) from the shared Yahoo bar cache, so a backtest right after
+    /market/prices (or concurrent with it) reuses the same fetch instead of a second one.
+    """
+    bars = await _fetch_yahoo_bars(symbol, rng, "1d")
+    return (np.asarray(bars["t"], dtype=np.int64) // 1000).tolist(), bars["c"]
+
+# Returns the response directly: the equity curve skips response-model validation and jsonable_encoder
+@router.post("/sma", response_model=None)
+async def sma_backtest(payload: Dict[str, Any]) -> DefaultResponse:
+    """
+    Simple moving-average crossover demo backtest.
+    Body: { symbol, range='1y', fast=20, slow=50, initial_cash=10000 }
+    """
+    symbol = (payload.get("symbol") or payload.get("ticker") or "").upper()
+    if not symbol:
+        raise HTTPException(422, "symbol required")
+    rng = str(payload.get("range", "1y"))
+    fast = int(payload.get("fast", 20))
+    slow = int(payload.get("slow", 50))
+    cash0 = float(payload.get("initial_cash", 10000))
+
+    ts, closes = await _daily_closes(symbol, rng)
+    bal, trades, equity = _run_crossover(ts, closes, fast, slow, cash0)
+
+    return DefaultResponse({
         "symbol": symbol,
         "range": rng,
         "fast": fast,
@@ -98,4 +121,4 @@ async def sma_backtest(payload: Dict[str, Any]) -> Dict[str, Any]:
         "final_equity": round(bal, 2),
         "trades": trades,
         "equity": equity
-    }
+    })
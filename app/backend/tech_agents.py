@@ -1,42 +1,108 @@
 # app/backend/agents/tech_agent.py
-from .base import AgentResult, register
+from app.backend.agents.base import AgentResult, register
 from typing import Dict, Any
+import logging
+import httpx
+import numpy as np
 import pandas as pd
 
-def _sma(s: pd.Series, n: int) -> pd.Series:
-    return s.rolling(n).mean()
+from fastapi import HTTPException
 
-def _rsi(s: pd.Series, n: int=14) -> pd.Series:
-    d = s.diff()
-    up = d.clip(lower=0).ewm(alpha=1/n, adjust=False).mean()
-    down = -d.clip(upper=0).ewm(alpha=1/n, adjust=False).mean()
+from app.backend.routers._market_utils import _LOOKBACK_DAYS, _fetch_yahoo_bars
+
+try:
+    from numba import njit  # optional; the kernels below run as plain Python without it
+except Exception:
+    njit = None
+
+def _jit(fn):
+    return njit(cache=True)(fn) if njit is not None else fn
+
+# Only the last two SMA values and the last RSI are used, so these work on the raw close
+# array and return scalars instead of building full pandas rolling/ewm Series.
+@_jit
+def _sma_last2(a: np.ndarray, n: int):
+    """(previous, last) n-bar SMA; nan where the window doesn't fit, like rolling(n).mean()."""
+    m = a.shape[0]
+    last = a[m - n:].mean() if m >= n else np.nan
+    prev = a[m - n - 1:m - 1].mean() if m >= n + 1 else np.nan
+    return prev, last
+
+@_jit
+def _rsi_last(a: np.ndarray, n: int = 14) -> float:
+    """
+    Final RSI with Wilder's smoothing in one pass: the averages start as the plain mean of
+    the first n changes, then avg = (avg*(n-1) + x)/n. Seeding with a mean rather than the
+    first change keeps the short (~3mo) windows the agent now fetches close to the
+    long-run value. nan until n changes are available.
+    """
+    up = 0.0
+    down = 0.0
+    k = 0
+    for i in range(1, a.shape[0]):
+        d = a[i] - a[i - 1]
+        if np.isnan(d):
+            continue
+        gain = d if d > 0 else 0.0
+        loss = -d if d < 0 else 0.0
+        if k < n:
+            up += gain / n
+            down += loss / n
+        else:
+            up = (up * (n - 1) + gain) / n
+            down = (down * (n - 1) + loss) / n
+        k += 1
+    if k < n:
+        return np.nan
     rs = up / (down + 1e-9)
     return 100 - (100 / (1 + rs))
 
-def _load_prices(symbol: str, period="1y", interval="1d") -> pd.DataFrame:
+async def _load_prices(symbol: str, period="1y", interval="1d") -> pd.DataFrame:
+    """
+    OHLCV frame from the market router's Yahoo chart fetch: async on the shared pooled
+    client and cached per (symbol, period, interval), instead of a blocking yfinance download.
+    """
     try:
-        import yfinance as yf
-    except Exception:
-        raise RuntimeError("yfinance not installed. Add yfinance to backend dependencies.")
-    df = yf.download(symbol, period=period, interval=interval, progress=False, auto_adjust=True)
-    return df if isinstance(df, pd.DataFrame) else pd.DataFrame()
+        bars = await _fetch_yahoo_bars(symbol, period, interval)
+    except (HTTPException, httpx.HTTPError, KeyError, TypeError, ValueError) as e:
+        # Like the yfinance download it replaces: no data rather than a failed agent
+        logging.warning(f"technicals: no prices for {symbol}: {type(e).__name__}: {e}")
+        return pd.DataFrame()
+    df = pd.DataFrame(bars).rename(columns={"o": "Open", "h": "High", "l": "Low", "c": "Close", "v": "Volume"})
+    return df.set_index(pd.to_datetime(df.pop("t"), unit="ms"))
+
+# Bars the signals need: the slowest window (SMA50, RSI14) plus a little warmup, ~60.
+# Shortest period that yields that many bars per interval (3mo of daily bars is ~63);
+# it is fetched unless the context asks for more.
+_MIN_PERIOD = {"1d": "3mo", "1wk": "2y", "1mo": "10y"}
+
+def _period_for(context: Dict[str, Any]) -> str:
+    period = str(context.get("period") or "").lower()
+    floor = _MIN_PERIOD.get(str(context.get("interval") or "1d").lower())
+    if floor is None:
+        return period or "1y"  # intraday etc.: no bar-count table, keep the 1y default
+    # Unknown periods (incl. "1d"/"5d") count as too short; "max" is always long enough
+    if period == "max" or _LOOKBACK_DAYS.get(period, 0) >= _LOOKBACK_DAYS[floor]:
+        return period
+    return floor
 
 class TechnicalsAgent:
     name = "technicals"
     kind = "rule"
     async def run(self, symbol: str, context: Dict[str, Any]) -> AgentResult:
-        period = context.get("period","1y"); interval = context.get("interval","1d")
-        df = _load_prices(symbol, period, interval)
+        period = _period_for(context); interval = context.get("interval","1d")
+        df = await _load_prices(symbol, period, interval)
         if df.empty: 
             return AgentResult(agent=self.name, decision="HOLD", confidence=0.3, rationale="No price data.")
-        close = df["Close"]
-        sma20, sma50 = _sma(close, 20), _sma(close, 50)
-        rsi = _rsi(close, 14)
-
-        cross_up   = sma20.iloc[-2] < sma50.iloc[-2] and sma20.iloc[-1] > sma50.iloc[-1]
-        cross_down = sma20.iloc[-2] > sma50.iloc[-2] and sma20.iloc[-1] < sma50.iloc[-1]
-        overbought = rsi.iloc[-1] > 70
-        oversold   = rsi.iloc[-1] < 30
+        close = df["Close"].to_numpy(dtype=np.float64).ravel()
+        s20_prev, s20_last = _sma_last2(close, 20)
+        s50_prev, s50_last = _sma_last2(close, 50)
+        rsi = _rsi_last(close, 14)
+
+        cross_up   = s20_prev < s50_prev and s20_last > s50_last
+        cross_down = s20_prev > s50_prev and s20_last < s50_last
+        overbought = rsi > 70
+        oversold   = rsi < 30
 
         score, why = 0.0, []
         if cross_up:   score += 0.5; why.append("20>50 SMA bullish cross")
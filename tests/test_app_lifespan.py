@@ -0,0 +1,36 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+
+from app.backend import http_client
+from app.backend.main import app
+
+
+class TestLifespan:
+    """Test suite for the app startup/shutdown hooks."""
+
+    def test_pooled_clients_survive_repeated_lifespans(self):
+        """Test that shutdown closes the pooled clients and leaves usable replacements."""
+        with TestClient(app):
+            first = http_client.DATA_CLIENT
+        with TestClient(app) as client:
+            assert client.get("/health").json() == {"ok": True}
+
+        assert first.is_closed
+        assert not http_client.LLM_CLIENT.is_closed
+        assert not http_client.DATA_CLIENT.is_closed
+
+    def test_clients_are_built_on_first_use(self):
+        """Test that startup opens no pooled client until a caller asks for one."""
+        asyncio.run(http_client.aclose_clients())  # drop clients left by earlier tests
+        with TestClient(app) as client:
+            client.get("/health")
+            assert http_client._CLIENTS == {}
+            data = http_client.DATA_CLIENT
+
+        assert http_client._CLIENTS == {}
+        assert data.is_closed
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,62 @@
+import math
+import numpy as np
+import pytest
+
+from app.backend.routers.backtest import _sma, _run_crossover
+
+
+class TestSMA:
+    """Test suite for the cumulative-sum SMA used by the backtest."""
+
+    def test_trailing_mean(self):
+        """Test that the SMA is nan during warmup and the trailing mean after."""
+        out = _sma(np.array([1.0, 2.0, 3.0, 4.0]), 2)
+        assert math.isnan(out[0])
+        assert out[1:].tolist() == [1.5, 2.5, 3.5]
+
+    def test_missing_values_are_skipped(self):
+        """Test that missing closes stay missing and do not break the window."""
+        out = _sma(np.array([1.0, np.nan, 3.0, 5.0]), 2)
+        assert math.isnan(out[0]) and math.isnan(out[1])
+        assert out[2:].tolist() == [2.0, 4.0]
+
+
+class TestCrossover:
+    """Test suite for the SMA crossover simulation."""
+
+    def test_buys_on_cross_up_and_sells_on_cross_down(self):
+        """Test that one up/down cycle produces a buy then a sell."""
+        closes = [10.0, 10.0, 10.0, 12.0, 14.0, 16.0, 12.0, 8.0, 6.0]
+        ts = list(range(len(closes)))
+
+        bal, trades, equity = _run_crossover(ts, closes, fast=1, slow=3, cash0=100.0)
+
+        assert [t["side"] for t in trades] == ["buy", "sell"]
+        assert trades[0] == {"t": 3000, "side": "buy", "price": 12.0, "shares": 8}
+        assert trades[1] == {"t": 6000, "side": "sell", "price": 12.0, "shares": 8}
+        assert bal == pytest.approx(100.0)
+        assert len(equity) == len(closes)
+        assert equity[5]["equity"] == pytest.approx(4.0 + 8 * 16.0)
+
+    def test_liquidates_open_position_at_end(self):
+        """Test that a position still open on the last bar is sold."""
+        closes = [10.0, 10.0, 11.0, 12.0, 13.0]
+        ts = list(range(len(closes)))
+
+        bal, trades, _ = _run_crossover(ts, closes, fast=1, slow=2, cash0=100.0)
+
+        assert trades[-1] == {"t": 4000, "side": "sell", "price": 13.0, "shares": 9}
+        assert bal == pytest.approx(100.0 - 9 * 11.0 + 9 * 13.0)
+
+    def test_waits_until_a_share_is_affordable(self):
+        """Test that entry is retried within a long run until cash covers one share."""
+        closes = [80.0, 80.0, 80.0, 80.0, 120.0, 100.0]
+        ts = list(range(len(closes)))
+
+        _, trades, _ = _run_crossover(ts, closes, fast=1, slow=4, cash0=100.0)
+
+        assert trades[0] == {"t": 5000, "side": "buy", "price": 100.0, "shares": 1}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
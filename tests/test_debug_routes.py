@@ -0,0 +1,26 @@
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+
+from app.backend import main
+from app.backend.main import app
+
+
+class TestAgentsAvailable:
+    """Test suite for /debug/agents-available."""
+
+    def test_first_scan_runs_off_the_event_loop(self):
+        """Test that the cold scan goes through a worker thread and later calls hit the cache."""
+        main._agent_module_names.cache_clear()
+        client = TestClient(app)
+        with patch.object(main.asyncio, 'to_thread', wraps=main.asyncio.to_thread) as to_thread:
+            first = client.get("/debug/agents-available").json()
+            second = client.get("/debug/agents-available").json()
+
+        assert first == second
+        assert first["ok"] and first["agents_by_module"]
+        assert to_thread.call_count == 2  # package import + scan, on the first call only
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,48 @@
+import asyncio
+import json
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from app.backend.llm_agents import BuffettAgent, _DECISION_FORMAT, _parse_decision
+
+
+class TestParseDecision:
+    """Test suite for parsing the structured-output decision JSON."""
+
+    def test_reads_schema_fields(self):
+        """Test that the JSON keys map onto the result and confidence is clamped."""
+        out = json.dumps({"rationale": "Wide moat", "decision": "BUY", "confidence": 1.4})
+
+        res = _parse_decision("buffett", out)
+
+        assert (res.decision, res.confidence, res.rationale) == ("BUY", 1.0, "Wide moat")
+
+    def test_unparseable_reply_holds(self):
+        """Test that a reply that is not the schema JSON becomes a low-confidence HOLD."""
+        res = _parse_decision("buffett", "I would buy it")
+
+        assert (res.decision, res.confidence) == ("HOLD", 0.3)
+
+
+class TestBuffettAgent:
+    """Test suite for the Buffett LLM agent request."""
+
+    @patch('app.backend.llm_agents.have_llm', return_value=True)
+    @patch('app.backend.llm_agents.call_openai', new_callable=AsyncMock)
+    def test_requests_structured_output_with_cache_key(self, mock_call, _):
+        """Test that the call uses the decision schema, a prompt cache key and a static-first prompt."""
+        mock_call.return_value = json.dumps({"rationale": "ok", "decision": "HOLD", "confidence": 0.5})
+
+        res = asyncio.run(BuffettAgent().run("KO", {"summary": "steady"}))
+
+        prompt = mock_call.await_args.args[0]
+        kwargs = mock_call.await_args.kwargs
+        assert res.decision == "HOLD"
+        assert kwargs["response_format"] is _DECISION_FORMAT
+        assert kwargs["prompt_cache_key"] == "buffett"
+        assert prompt.lstrip().startswith("Act like Warren Buffett")
+        assert prompt.endswith("Stock: KO\nContext: steady\n")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
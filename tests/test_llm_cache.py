@@ -0,0 +1,52 @@
+import pytest
+from unittest.mock import patch
+
+from app.backend.agents.cache import LLMCache
+
+
+class TestLLMCache:
+    """Test suite for the in-process prompt/response cache."""
+
+    def test_key_is_order_independent(self):
+        """Test that the cache key does not depend on dict key order."""
+        messages = [{"role": "user", "content": "hi"}]
+        k1 = LLMCache.key("gpt-4o-mini", messages, 0.2)
+        k2 = LLMCache.key("gpt-4o-mini", [{"content": "hi", "role": "user"}], 0.2)
+        assert k1 == k2
+        assert k1 != LLMCache.key("gpt-4o-mini", messages, 0.3)
+
+    def test_hit_and_miss(self):
+        """Test that stored completions are returned and unknown keys miss."""
+        cache = LLMCache()
+        cache.set("a", "PONG")
+        assert cache.get("a") == "PONG"
+        assert cache.get("b") is None
+
+    @patch('app.backend.cache.time.monotonic')
+    def test_entries_expire_after_ttl(self, mock_monotonic):
+        """Test that entries older than the TTL are dropped."""
+        cache = LLMCache(ttl=10)
+        mock_monotonic.return_value = 100.0
+        cache.set("a", "PONG")
+
+        mock_monotonic.return_value = 105.0
+        assert cache.get("a") == "PONG"
+
+        mock_monotonic.return_value = 111.0
+        assert cache.get("a") is None
+
+    def test_evicts_least_recently_used(self):
+        """Test that the oldest untouched entry is evicted past maxsize."""
+        cache = LLMCache(maxsize=2)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.get("a")  # refresh "a" so "b" is the LRU entry
+        cache.set("c", "3")
+
+        assert cache.get("a") == "1"
+        assert cache.get("b") is None
+        assert cache.get("c") == "3"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,87 @@
+import asyncio
+import httpx
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from app.backend.http_client import post_with_retry
+
+
+def _client(responses):
+    """Build an AsyncClient that replays the given responses in order."""
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return responses[len(calls) - 1]
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler)), calls
+
+
+class TestPostWithRetry:
+    """Test suite for the OpenAI retry/backoff helper."""
+
+    @patch('app.backend.http_client.asyncio.sleep', new_callable=AsyncMock)
+    def test_retries_rate_limit_then_succeeds(self, mock_sleep):
+        """Test that a 429 with Retry-After is retried after that delay."""
+        client, calls = _client([
+            httpx.Response(429, headers={"Retry-After": "2"}, json={"error": {"code": "rate_limit_exceeded"}}),
+            httpx.Response(200, json={"ok": True}),
+        ])
+
+        resp = asyncio.run(post_with_retry(client, "https://api.test/v1/chat"))
+
+        assert resp.status_code == 200
+        assert len(calls) == 2
+        mock_sleep.assert_awaited_once_with(2.0)
+
+    @patch('app.backend.http_client.asyncio.sleep', new_callable=AsyncMock)
+    def test_does_not_retry_quota_errors(self, mock_sleep):
+        """Test that insufficient_quota 429s are returned immediately."""
+        client, calls = _client([
+            httpx.Response(429, json={"error": {"code": "insufficient_quota"}}),
+        ])
+
+        resp = asyncio.run(post_with_retry(client, "https://api.test/v1/chat"))
+
+        assert resp.status_code == 429
+        assert len(calls) == 1
+        mock_sleep.assert_not_awaited()
+
+    @patch('app.backend.http_client.asyncio.sleep', new_callable=AsyncMock)
+    def test_returns_last_response_after_max_attempts(self, mock_sleep):
+        """Test that persistent 5xx stops after max_attempts and returns the final response."""
+        client, calls = _client([httpx.Response(503)] * 3)
+
+        resp = asyncio.run(post_with_retry(client, "https://api.test/v1/chat", max_attempts=3))
+
+        assert resp.status_code == 503
+        assert len(calls) == 3
+        assert mock_sleep.await_count == 2
+
+    @patch('app.backend.http_client.asyncio.sleep', new_callable=AsyncMock)
+    def test_client_errors_are_not_retried(self, mock_sleep):
+        """Test that non-429 4xx responses are returned without retrying."""
+        client, calls = _client([httpx.Response(401)])
+
+        resp = asyncio.run(post_with_retry(client, "https://api.test/v1/chat"))
+
+        assert resp.status_code == 401
+        assert len(calls) == 1
+        mock_sleep.assert_not_awaited()
+
+    def test_streamed_response_holds_slot_until_closed(self):
+        """Test that a streamed 2xx keeps its LLM_SEMAPHORE slot until aclose()."""
+        client, _ = _client([httpx.Response(200, stream=httpx.ByteStream(b"data: [DONE]\n\n"))])
+
+        async def main():
+            with patch('app.backend.http_client.LLM_SEMAPHORE', asyncio.Semaphore(1)) as sem:
+                resp = await post_with_retry(client, "https://api.test/v1/chat", stream=True)
+                held = sem.locked()
+                await resp.aclose()
+                return held, sem.locked()
+
+        assert asyncio.run(main()) == (True, False)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,90 @@
+import asyncio
+import json
+import re
+import httpx
+import pytest
+from unittest.mock import patch
+
+from app.backend import http_client, llm_config
+from app.backend.agents import llm_client
+
+
+def _sse(*deltas):
+    """Build an OpenAI-style SSE body streaming the given content deltas."""
+    frames = [
+        "data: " + json.dumps({"choices": [{"index": 0, "delta": {"content": d}}]})
+        for d in deltas
+    ]
+    return ("\n\n".join(frames + ["data: [DONE]"]) + "\n\n").encode()
+
+
+def _client(body, calls):
+    def handler(request):
+        calls.append(json.loads(request.content))
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=body)
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+class TestChatStreaming:
+    """Test suite for the streaming chat completion path."""
+
+    @patch.object(llm_config, 'MOCK', False)
+    @patch.object(llm_config, 'OPENAI_API_KEY', 'sk-test')
+    @patch.object(llm_config, 'LLM_PROVIDER', 'openai')
+    def test_accumulates_deltas(self):
+        """Test that streamed deltas are joined into the reply text."""
+        calls = []
+        body = _sse("Final action: ", "buy\n", "Confidence: 0.8")
+        with patch.object(http_client, 'LLM_CLIENT', _client(body, calls)):
+            text = asyncio.run(llm_client.chat("stream test one", temperature=0.9))
+
+        assert text == "Final action: buy\nConfidence: 0.8"
+        assert calls[0]["stream"] is True
+
+    @patch.object(llm_config, 'MOCK', False)
+    @patch.object(llm_config, 'OPENAI_API_KEY', 'sk-test')
+    @patch.object(llm_config, 'LLM_PROVIDER', 'openai')
+    def test_stops_once_pattern_matches(self):
+        """Test that reading stops as soon as stop_at matches the text so far."""
+        calls = []
+        body = _sse("Final action: sell\n", "Confidence: 0.6\n", "Extra commentary")
+        with patch.object(http_client, 'LLM_CLIENT', _client(body, calls)):
+            text = asyncio.run(llm_client.chat(
+                "stream test two", temperature=0.9, stop_at=re.compile(r"confidence:\s*[0-9.]+\s", re.I),
+            ))
+
+        assert text == "Final action: sell\nConfidence: 0.6"
+
+    @patch.object(llm_config, 'MOCK', False)
+    @patch.object(llm_config, 'OPENAI_API_KEY', 'sk-test')
+    @patch.object(llm_config, 'LLM_PROVIDER', 'openai')
+    def test_truncated_reply_is_not_served_to_full_callers(self):
+        """Test that a reply cut short by stop_at is cached apart from the full reply."""
+        calls = []
+        body = _sse("Final action: hold\n", "Confidence: 0.5\n", "Extra commentary")
+        stop = re.compile(r"confidence:\s*[0-9.]+\s", re.I)
+        with patch.object(http_client, 'LLM_CLIENT', _client(body, calls)):
+            short = asyncio.run(llm_client.chat("stream test three", temperature=0.0, stop_at=stop))
+            full = asyncio.run(llm_client.chat("stream test three", temperature=0.0))
+            again = asyncio.run(llm_client.chat("stream test three", temperature=0.0, stop_at=stop))
+
+        assert short == again == "Final action: hold\nConfidence: 0.5"
+        assert full.endswith("Extra commentary")
+        assert len(calls) == 2
+
+
+class TestMockReply:
+    """Test the LLM_MOCK reply generator."""
+
+    @patch.object(llm_config, 'MOCK_MODE', 'sell')
+    def test_uses_configured_mock_mode(self):
+        """Test that LLM_MOCK_MODE is taken from the loaded config, not re-read per call."""
+        with patch.dict("os.environ", {"LLM_MOCK_MODE": "buy"}):
+            reply = llm_client._mock_reply("You are the Buffett agent. Analyze AAPL")
+
+        assert "sell" in reply.lower()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
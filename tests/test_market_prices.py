@@ -0,0 +1,37 @@
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, patch
+
+from app.backend.main import app
+
+_BARS = {"t": [1000], "o": [1.0], "h": [1.0], "l": [1.0], "c": [1.0], "v": [10]}
+
+
+@patch('app.backend.routers.market._fetch_stooq_bars', new_callable=AsyncMock)
+@patch('app.backend.routers.market._fetch_yahoo_bars', new_callable=AsyncMock)
+class TestAutoSource:
+    """Test suite for the Yahoo -> Stooq fallback of /market/prices?source=auto."""
+
+    def test_stooq_not_fetched_when_yahoo_succeeds(self, mock_yahoo, mock_stooq):
+        """Test that a Yahoo answer never starts the Stooq download."""
+        mock_yahoo.return_value = _BARS
+
+        data = TestClient(app).get("/market/prices", params={"ticker": "aapl"}).json()
+
+        assert data["source"] == "yahoo"
+        mock_stooq.assert_not_called()
+
+    def test_falls_back_to_stooq_when_yahoo_fails(self, mock_yahoo, mock_stooq):
+        """Test that a Yahoo error is answered from Stooq."""
+        mock_yahoo.side_effect = HTTPException(502, "down")
+        mock_stooq.return_value = _BARS
+
+        data = TestClient(app).get("/market/prices", params={"ticker": "aapl"}).json()
+
+        assert (data["source"], data["count"]) == ("stooq", 1)
+        mock_stooq.assert_awaited_once_with("AAPL", "1y")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,122 @@
+import json
+import httpx
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+
+from app.backend import http_client, llm_config
+from app.backend.main import app
+
+
+def _reply(custom_id, text):
+    body = {"choices": [{"index": 0, "message": {"role": "assistant", "content": text}}]}
+    return {"custom_id": custom_id, "response": {"status_code": 200, "body": body}}
+
+
+def _openai(routes, calls):
+    """Build an AsyncClient answering OpenAI paths from `routes` (path -> response)."""
+    def handler(request):
+        calls.append(request)
+        return routes[request.url.path]
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+@patch.object(llm_config, 'MOCK', False)
+@patch.object(llm_config, 'OPENAI_API_KEY', 'sk-test')
+@patch.object(llm_config, 'LLM_PROVIDER', 'openai')
+class TestSignalBatch:
+    """Test suite for the /agents/signal/batch submit and poll endpoints."""
+
+    def test_submit_uploads_one_request_per_pair(self):
+        """Test that every (ticker, persona) prompt is queued in a single batch job."""
+        calls = []
+        routes = {
+            "/v1/files": httpx.Response(200, json={"id": "file-in"}),
+            "/v1/batches": httpx.Response(200, json={"id": "batch_1", "status": "validating"}),
+        }
+        body = {"tickers": ["AAPL", "MSFT"], "agents": ["buffett", "munger"], "budget": 1000, "risk": "low"}
+        with patch.object(http_client, 'LLM_CLIENT', _openai(routes, calls)):
+            resp = TestClient(app).post("/agents/signal/batch", json=body)
+
+        assert resp.status_code == 200
+        assert resp.json() == {"mode": "batch", "batch_id": "batch_1", "status": "validating"}
+        lines = [json.loads(line) for line in calls[0].content.splitlines() if line.startswith(b"{")]
+        assert [line["custom_id"] for line in lines] == [
+            "0:0:AAPL:buffett", "0:1:AAPL:munger", "1:0:MSFT:buffett", "1:1:MSFT:munger",
+        ]
+        assert json.loads(calls[1].content)["metadata"] == {"model": llm_config.LLM_MODEL}
+
+    def test_poll_rebuilds_results_in_request_order(self):
+        """Test that a completed batch comes back in the /signal shape, failures as hold."""
+        calls = []
+        output = "\n".join(json.dumps(line) for line in [
+            _reply("1:0:MSFT:buffett", "Cheap.\nFinal action: sell\nConfidence: 0.9"),
+            _reply("0:0:AAPL:buffett", "Moat.\nFinal action: buy\nConfidence: 0.8"),
+            {"custom_id": "0:1:AAPL:munger", "response": {"status_code": 500, "body": {}}},
+            _reply("1:1:MSFT:munger", "Final action: sell\nConfidence: 0.7"),
+        ])
+        routes = {
+            "/v1/batches/batch_1": httpx.Response(200, json={
+                "id": "batch_1", "status": "completed", "output_file_id": "file-out", "metadata": {"model": "m"},
+            }),
+            "/v1/files/file-out/content": httpx.Response(200, text=output),
+        }
+        with patch.object(http_client, 'LLM_CLIENT', _openai(routes, calls)):
+            data = TestClient(app).get("/agents/signal/batch/batch_1").json()
+
+        assert data["llm_model"] == "m"
+        assert [r["ticker"] for r in data["results"]] == ["AAPL", "MSFT"]
+        aapl, msft = data["results"]
+        assert [(d["agent"], d["action"]) for d in aapl["decisions"]] == [("buffett", "buy"), ("munger", "hold")]
+        assert msft["final_vote"] == "sell"
+
+    def test_poll_handles_tickers_containing_colons(self):
+        """Test that custom_ids are parsed from the right so exchange-prefixed tickers survive."""
+        output = _reply("0:0:XNAS:AAPL:buffett", "Final action: sell\nConfidence: 0.7")
+        routes = {
+            "/v1/batches/batch_1": httpx.Response(200, json={
+                "id": "batch_1", "status": "completed", "output_file_id": "file-out",
+            }),
+            "/v1/files/file-out/content": httpx.Response(200, text=json.dumps(output)),
+        }
+        with patch.object(http_client, 'LLM_CLIENT', _openai(routes, [])):
+            resp = TestClient(app).get("/agents/signal/batch/batch_1")
+
+        assert resp.status_code == 200
+        result = resp.json()["results"][0]
+        assert result["ticker"] == "XNAS:AAPL"
+        assert result["decisions"][0]["agent"] == "buffett"
+
+    def test_poll_skips_lines_without_custom_id(self):
+        """Test that an output line missing its custom_id is ignored rather than failing the poll."""
+        output = "\n".join(json.dumps(line) for line in [
+            {"response": {"status_code": 500, "body": {}}},
+            _reply("0:0:AAPL:buffett", "Final action: buy\nConfidence: 0.8"),
+        ])
+        routes = {
+            "/v1/batches/batch_1": httpx.Response(200, json={
+                "id": "batch_1", "status": "completed", "output_file_id": "file-out",
+            }),
+            "/v1/files/file-out/content": httpx.Response(200, text=output),
+        }
+        with patch.object(http_client, 'LLM_CLIENT', _openai(routes, [])):
+            resp = TestClient(app).get("/agents/signal/batch/batch_1")
+
+        assert resp.status_code == 200
+        assert [r["ticker"] for r in resp.json()["results"]] == ["AAPL"]
+
+    def test_poll_reports_status_until_completed(self):
+        """Test that an unfinished batch returns its status and counts only."""
+        routes = {"/v1/batches/batch_1": httpx.Response(200, json={
+            "id": "batch_1", "status": "in_progress", "request_counts": {"total": 4, "completed": 1},
+        })}
+        with patch.object(http_client, 'LLM_CLIENT', _openai(routes, [])):
+            data = TestClient(app).get("/agents/signal/batch/batch_1").json()
+
+        assert data["status"] == "in_progress"
+        assert "results" not in data
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
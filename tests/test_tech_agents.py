@@ -0,0 +1,95 @@
+import asyncio
+import httpx
+import math
+import numpy as np
+import pytest
+from fastapi import HTTPException
+from unittest.mock import AsyncMock, patch
+
+from app.backend.tech_agents import TechnicalsAgent, _load_prices, _period_for, _rsi_last
+
+
+def _bars(closes):
+    n = len(closes)
+    return {
+        "t": [86_400_000 * i for i in range(n)],
+        "o": list(closes), "h": list(closes), "l": list(closes), "c": list(closes),
+        "v": [100] * n,
+    }
+
+
+class TestLoadPrices:
+    """Test suite for the technicals agent's price loader."""
+
+    @patch('app.backend.tech_agents._fetch_yahoo_bars', new_callable=AsyncMock)
+    def test_builds_ohlcv_frame_from_bars(self, mock_fetch):
+        """Test that columnar bars become a datetime-indexed OHLCV frame."""
+        mock_fetch.return_value = _bars([10.0, 11.0])
+
+        df = asyncio.run(_load_prices("AAPL", "3mo", "1d"))
+
+        mock_fetch.assert_awaited_once_with("AAPL", "3mo", "1d")
+        assert list(df.columns) == ["Open", "High", "Low", "Close", "Volume"]
+        assert df["Close"].tolist() == [10.0, 11.0]
+        assert str(df.index[1].date()) == "1970-01-02"
+
+    @patch('app.backend.tech_agents._fetch_yahoo_bars', new_callable=AsyncMock)
+    def test_fetch_error_gives_empty_frame(self, mock_fetch):
+        """Test that a failed fetch yields an empty frame (and a HOLD from run)."""
+        mock_fetch.side_effect = HTTPException(502, "down")
+
+        assert asyncio.run(_load_prices("AAPL")).empty
+        res = asyncio.run(TechnicalsAgent().run("AAPL", {}))
+        assert res.decision == "HOLD"
+
+    @pytest.mark.parametrize("error", [httpx.ConnectTimeout("slow"), KeyError("chart"), TypeError("bad")])
+    @patch('app.backend.tech_agents._fetch_yahoo_bars', new_callable=AsyncMock)
+    def test_transport_and_parse_errors_give_empty_frame(self, mock_fetch, error):
+        """Test that network and malformed-payload errors also fall back to no data."""
+        mock_fetch.side_effect = error
+
+        assert asyncio.run(_load_prices("AAPL")).empty
+
+
+class TestPeriod:
+    """Test suite for the technicals agent's fetch window."""
+
+    @pytest.mark.parametrize("period, expected", [
+        (None, "3mo"), ("1d", "3mo"), ("5d", "3mo"), ("1mo", "3mo"), ("bogus", "3mo"),
+        ("6mo", "6mo"), ("1Y", "1y"), ("max", "max"),
+    ])
+    def test_short_periods_widen_to_minimum(self, period, expected):
+        """Test that periods with too few bars for SMA50 are widened to 3mo."""
+        assert _period_for({"period": period}) == expected
+
+    @pytest.mark.parametrize("context, expected", [
+        ({"interval": "1wk"}, "2y"), ({"interval": "1wk", "period": "6mo"}, "2y"),
+        ({"interval": "1wk", "period": "5y"}, "5y"), ({"interval": "1mo"}, "10y"),
+        ({"interval": "1h"}, "1y"),
+    ])
+    def test_minimum_scales_with_interval(self, context, expected):
+        """Test that weekly/monthly bars get a window long enough for SMA50."""
+        assert _period_for(context) == expected
+
+
+class TestRSI:
+    """Test suite for the single-pass Wilder RSI kernel."""
+
+    def test_matches_wilder_with_mean_seed(self):
+        """Test that the RSI equals Wilder's smoothing seeded with the first-n mean."""
+        closes = 100 + np.cumsum(np.random.default_rng(0).normal(size=120))
+        d = np.diff(closes)
+        gain, loss = np.clip(d, 0, None), np.clip(-d, 0, None)
+        avg_g, avg_l = gain[:14].mean(), loss[:14].mean()
+        for g, l in zip(gain[14:], loss[14:]):
+            avg_g, avg_l = (avg_g * 13 + g) / 14, (avg_l * 13 + l) / 14
+
+        assert _rsi_last(closes, 14) == pytest.approx(100 - 100 / (1 + avg_g / (avg_l + 1e-9)))
+
+    def test_nan_until_enough_changes(self):
+        """Test that fewer than n price changes give no RSI."""
+        assert math.isnan(_rsi_last(np.arange(10, dtype=np.float64), 14))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,47 @@
+import asyncio
+import pytest
+
+from app.backend.cache import TTLCache
+
+
+class TestGetOrLoad:
+    """Test suite for TTLCache.get_or_load request coalescing."""
+
+    def test_concurrent_misses_share_one_load(self):
+        """Test that simultaneous misses on a key await a single loader call."""
+        cache = TTLCache()
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return [1, 2, 3]
+
+        async def main():
+            return await asyncio.gather(*(cache.get_or_load("AAPL", loader) for _ in range(5)))
+
+        results = asyncio.run(main())
+
+        assert results == [[1, 2, 3]] * 5
+        assert len(calls) == 1
+        assert cache.get("AAPL") == [1, 2, 3]
+
+    def test_failed_load_is_not_cached(self):
+        """Test that a loader error propagates and the next call retries."""
+        cache = TTLCache()
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError("upstream down")
+            return "ok"
+
+        with pytest.raises(RuntimeError):
+            asyncio.run(cache.get_or_load("k", loader))
+        assert asyncio.run(cache.get_or_load("k", loader)) == "ok"
+        assert len(calls) == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])